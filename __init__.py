@@ -9,14 +9,72 @@ def create_app(config_name='default'):
     # Load configuration
     app.config.from_object(config[config_name])
 
-    # Register blueprints
-    from weather_api_next.api import api_bp
-    app.register_blueprint(api_bp, url_prefix='/api/v1')
+    # Trace allocations for the admin memory report
+    if app.config.get('WEATHER_TRACEMALLOC'):
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(app.config['WEATHER_TRACEMALLOC'])
 
     @app.route('/health')
     def health_check():
         """Simple health check endpoint"""
         return {'status': 'healthy'}, 200
 
+    # Record a sample of incoming traffic for replay.py
+    if app.config.get('WEATHER_CAPTURE_FILE'):
+        from weather_api_next.capture import TrafficCapture
+        TrafficCapture.from_config(app.config).init_app(app)
+
+    # In sharded mode this app only routes requests to the shard nodes
+    if app.config.get('WEATHER_SHARDS'):
+        from weather_api_next.router import ShardRouter
+        ShardRouter.from_config(app.config).init_app(app)
+        return app
+
+    # Register blueprints
+    from weather_api_next.api import api_bp
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
+
+    # Derived metrics are cached per store generation
+    from weather_api_next.api.derived import DerivedCache
+    app.extensions['weather_derived_cache'] = DerivedCache(app.config.get('WEATHER_DERIVED_CACHE_SIZE', 32))
+
+    # Sorted indexes answering top-K extremes queries
+    if app.config.get('WEATHER_EXTREMES_INDEX'):
+        from weather_api_next.api.extremes import ExtremesIndex
+        ExtremesIndex().init_app(app)
+
+    # Fill in missing or stale locations from an upstream source
+    if app.config.get('WEATHER_PROVIDER_URL'):
+        from weather_api_next.provider import WeatherProvider
+        WeatherProvider.from_config(app.config).init_app(app)
+
+    # Expire readings whose TTL (global or per record) has passed
+    from weather_api_next.expiry import ExpiryScheduler
+    ExpiryScheduler.from_config(app.config).init_app(app)
+
+    # Coalesce frequent PUTs before indexes and followers hear of them
+    if app.config.get('WEATHER_WRITE_BEHIND_WINDOW'):
+        from weather_api_next.writebehind import WriteBehindBuffer
+        WriteBehindBuffer.from_config(app.config).init_app(app)
+
+    # Stream mutations to followers, or follow a leader as a read replica
+    from weather_api_next.replication import init_replication
+    init_replication(app)
+
+    # Long searches and aggregations as background jobs in a process pool
+    from weather_api_next.jobs import JobManager
+    JobManager.from_config(app.config).init_app(app)
+
+    # Answer hot single-location reads before they reach Flask routing
+    if app.config.get('WEATHER_FAST_PATH'):
+        from weather_api_next.fastpath import FastPath
+        FastPath().init_app(app)
+
+    # Load the dataset and warm caches once, ideally in the pre-fork master
+    if app.config.get('WEATHER_PRELOAD') or app.config.get('WEATHER_DATA_FILE'):
+        from weather_api_next.preload import preload
+        preload(app, app.config.get('WEATHER_DATA_FILE'))
+
     return app
 
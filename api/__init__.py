@@ -4,6 +4,7 @@ api_bp = Blueprint('api', __name__)
 
 # Import routes at end to avoid circular imports
 from weather_api_next.api import routes
+from weather_api_next.api import admin
 
 # Error handlers
 @api_bp.errorhandler(404)
@@ -32,8 +33,8 @@ class APIError(Exception):
         rv['error'] = self.message
         return rv
 
-# Register handler for custom exception
-@api_bp.errorhandler(APIError)
+# Register handler for custom exception, also raised by the jobs routes
+@api_bp.app_errorhandler(APIError)
 def handle_api_error(error):
     response = jsonify(error.to_dict())
     response.status_code = error.status_code
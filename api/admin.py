@@ -0,0 +1,72 @@
+"""Admin-only introspection endpoints"""
+import hmac
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+from weather_api_next.api import api_bp
+from weather_api_next.api.memory import (
+    component_size, store_footprint, string_sharing, top_allocations
+)
+from weather_api_next.api.routes import weather_data
+
+# Helper objects registered on the app whose internal tables are reported
+COMPONENTS = ('weather_provider', 'weather_expiry', 'weather_replication', 'weather_derived_cache',
+              'weather_extremes', 'weather_write_behind')
+
+# Bounds on the per-request work a memory report may ask for
+MAX_SAMPLE = 100000
+MAX_TOP = 100
+
+
+def admin_required(view):
+    """Only allow requests carrying the configured admin token"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = current_app.config.get('WEATHER_ADMIN_TOKEN')
+        if not token:
+            return jsonify({'error': 'Admin access is not configured'}), 403
+
+        supplied = request.headers.get('X-Admin-Token', '')
+        authorization = request.headers.get('Authorization', '')
+        if authorization.startswith('Bearer '):
+            supplied = authorization[len('Bearer '):]
+
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return jsonify({'error': 'Admin token required'}), 401
+
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@api_bp.route('/admin/memory', methods=['GET'])
+@admin_required
+def get_memory_footprint():
+    """Report estimated memory used by the store and derived structures"""
+    try:
+        sample = int(request.args.get('sample', current_app.config.get('WEATHER_MEMORY_SAMPLE', 1000)))
+        top = int(request.args.get('top', 10))
+    except ValueError:
+        return jsonify({'error': 'sample and top must be integers'}), 400
+
+    if sample < 1 or sample > MAX_SAMPLE:
+        return jsonify({'error': f'sample must be between 1 and {MAX_SAMPLE}'}), 400
+
+    if top < 1 or top > MAX_TOP:
+        return jsonify({'error': f'top must be between 1 and {MAX_TOP}'}), 400
+
+    # Components referencing the store do not count it again
+    components = {name: component_size(current_app.extensions[name], {id(weather_data)}, sample)
+                  for name in COMPONENTS if name in current_app.extensions}
+
+    report = {
+        'store': store_footprint(weather_data, sample),
+        'strings': string_sharing(weather_data, sample),
+        'components': components
+    }
+
+    if request.args.get('tracemalloc', '').lower() in ('1', 'true', 'yes'):
+        allocations = top_allocations(top)
+        report['tracemalloc'] = {'tracing': allocations is not None, 'top': allocations or []}
+
+    return jsonify(report)
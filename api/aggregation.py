@@ -0,0 +1,164 @@
+"""Single-pass aggregation over weather records"""
+import math
+from bisect import bisect_left
+
+GROUP_BY_FIELDS = ('conditions',)
+HISTOGRAM_FIELDS = ('temperature', 'humidity')
+BUCKET_MODES = ('fixed', 'quantile')
+
+# Upper bound on the buckets of one fixed-width histogram
+MAX_BUCKETS = 1000
+
+
+class HistogramError(ValueError):
+    """Raised when values cannot be split into fixed-width buckets"""
+
+
+class PartialAggregate:
+    """Mergeable running count/sum/min/max for temperature and humidity"""
+    __slots__ = ('count', 'temperature_sum', 'min_temperature', 'max_temperature',
+                 'humidity_sum', 'min_humidity', 'max_humidity')
+
+    def __init__(self):
+        self.count = 0
+        self.temperature_sum = 0
+        self.min_temperature = None
+        self.max_temperature = None
+        self.humidity_sum = 0
+        self.min_humidity = None
+        self.max_humidity = None
+
+    def add(self, data):
+        """Fold a single weather record into the aggregate"""
+        temperature = data['temperature']
+        humidity = data['humidity']
+        if self.count == 0:
+            self.min_temperature = self.max_temperature = temperature
+            self.min_humidity = self.max_humidity = humidity
+        else:
+            if temperature < self.min_temperature:
+                self.min_temperature = temperature
+            elif temperature > self.max_temperature:
+                self.max_temperature = temperature
+            if humidity < self.min_humidity:
+                self.min_humidity = humidity
+            elif humidity > self.max_humidity:
+                self.max_humidity = humidity
+        self.count += 1
+        self.temperature_sum += temperature
+        self.humidity_sum += humidity
+
+    def merge(self, other):
+        """Combine another partial aggregate into this one"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            for name in self.__slots__:
+                setattr(self, name, getattr(other, name))
+            return self
+        self.count += other.count
+        self.temperature_sum += other.temperature_sum
+        self.humidity_sum += other.humidity_sum
+        self.min_temperature = min(self.min_temperature, other.min_temperature)
+        self.max_temperature = max(self.max_temperature, other.max_temperature)
+        self.min_humidity = min(self.min_humidity, other.min_humidity)
+        self.max_humidity = max(self.max_humidity, other.max_humidity)
+        return self
+
+    def to_dict(self):
+        """Summary in the same shape as the stats endpoint"""
+        count = self.count
+        return {
+            'count': count,
+            'avg_temperature': self.temperature_sum / count if count else None,
+            'min_temperature': self.min_temperature,
+            'max_temperature': self.max_temperature,
+            'avg_humidity': self.humidity_sum / count if count else None,
+            'min_humidity': self.min_humidity,
+            'max_humidity': self.max_humidity
+        }
+
+
+def fixed_width_buckets(counts, width):
+    """Turn {bucket_index: count} into an ordered bucket list"""
+    return [{'lower': index * width, 'upper': (index + 1) * width, 'count': counts[index]}
+            for index in sorted(counts)]
+
+
+def quantile_buckets(values, quantiles):
+    """Split sorted values into equal-frequency buckets"""
+    if not values:
+        return []
+
+    last = len(values) - 1
+    edges = [values[round(last * step / quantiles)] for step in range(quantiles + 1)]
+
+    buckets = []
+    for index, (lower, upper) in enumerate(zip(edges, edges[1:])):
+        # The final bucket is closed on the right so the maximum is counted
+        if index == quantiles - 1:
+            count = len(values) - bisect_left(values, lower)
+        else:
+            count = bisect_left(values, upper) - bisect_left(values, lower)
+        buckets.append({'lower': lower, 'upper': upper, 'count': count})
+    return buckets
+
+
+def aggregate(records, group_by=None, histograms=(), bucket_mode='fixed',
+              bucket_width=10.0, quantiles=4, predicate=None):
+    """Aggregate weather records in a single pass
+
+    ``records`` is any iterable of weather dicts. Returns the overall
+    summary, optional per-group summaries and optional histograms.
+    """
+    overall = PartialAggregate()
+    groups = {}
+    fixed_counts = {field: {} for field in histograms}
+    values = {field: [] for field in histograms}
+
+    for data in records:
+        if predicate is not None and not predicate(data):
+            continue
+
+        overall.add(data)
+
+        if group_by:
+            key = data[group_by]
+            partial = groups.get(key)
+            if partial is None:
+                partial = groups[key] = PartialAggregate()
+            partial.add(data)
+
+        for field in histograms:
+            value = data[field]
+            if bucket_mode == 'quantile':
+                values[field].append(value)
+            else:
+                try:
+                    index = math.floor(value / bucket_width)
+                except (OverflowError, ValueError):
+                    raise HistogramError(f'{field} value {value} is out of range '
+                                         f'for bucket_width {bucket_width}') from None
+                counts = fixed_counts[field]
+                count = counts.get(index)
+                if count is None:
+                    if len(counts) >= MAX_BUCKETS:
+                        raise HistogramError(f'{field} histogram needs more than {MAX_BUCKETS} buckets, '
+                                             'use a larger bucket_width')
+                    count = 0
+                counts[index] = count + 1
+
+    result = overall.to_dict()
+
+    if group_by:
+        result['groups'] = {key: partial.to_dict() for key, partial in groups.items()}
+
+    if histograms:
+        if bucket_mode == 'quantile':
+            result['histograms'] = {field: quantile_buckets(sorted(values[field]), quantiles)
+                                    for field in histograms}
+        else:
+            result['histograms'] = {field: fixed_width_buckets(fixed_counts[field], bucket_width)
+                                    for field in histograms}
+
+    return result
@@ -0,0 +1,167 @@
+"""Derived comfort metrics: dew point, heat index and comfort bands
+
+Temperatures are in degrees Celsius and humidity in percent. Batches are
+computed with NumPy when it is installed and fall back to a plain
+per-record loop otherwise.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+# Magnus formula coefficients (Alduchov and Eskridge)
+MAGNUS_A = 17.62
+MAGNUS_B = 243.12
+# Temperatures in Celsius over which these coefficients hold
+MAGNUS_RANGE = (-45.0, 60.0)
+
+# Comfort bands keyed by upper dew point bound in degrees Celsius
+COMFORT_BANDS = (
+    (10.0, 'dry'),
+    (15.5, 'comfortable'),
+    (18.3, 'humid'),
+    (21.0, 'muggy'),
+    (24.0, 'oppressive'),
+    (float('inf'), 'miserable')
+)
+BAND_LIMITS = [limit for limit, _ in COMFORT_BANDS]
+BAND_NAMES = [name for _, name in COMFORT_BANDS]
+
+
+def dew_point(temperature, humidity):
+    """Dew point in Celsius, or None for zero humidity or outside MAGNUS_RANGE"""
+    if humidity <= 0 or not MAGNUS_RANGE[0] <= temperature <= MAGNUS_RANGE[1]:
+        return None
+    gamma = math.log(humidity / 100) + MAGNUS_A * temperature / (MAGNUS_B + temperature)
+    return MAGNUS_B * gamma / (MAGNUS_A - gamma)
+
+
+def heat_index(temperature, humidity):
+    """NWS heat index in Celsius (Rothfusz regression with adjustments)"""
+    t = temperature * 9 / 5 + 32
+    simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + humidity * 0.094)
+    if (simple + t) / 2 < 80:
+        return (simple - 32) * 5 / 9
+
+    hi = (-42.379 + 2.04901523 * t + 10.14333127 * humidity - 0.22475541 * t * humidity
+          - 0.00683783 * t * t - 0.05481717 * humidity * humidity
+          + 0.00122874 * t * t * humidity + 0.00085282 * t * humidity * humidity
+          - 0.00000199 * t * t * humidity * humidity)
+    if humidity < 13 and 80 <= t <= 112:
+        hi -= (13 - humidity) / 4 * math.sqrt((17 - abs(t - 95)) / 17)
+    elif humidity > 85 and 80 <= t <= 87:
+        hi += (humidity - 85) / 10 * (87 - t) / 5
+    return (hi - 32) * 5 / 9
+
+
+def comfort_band(dew):
+    """Comfort band name for a dew point"""
+    if dew is None:
+        return 'dry'
+    for limit, name in COMFORT_BANDS:
+        if dew < limit:
+            return name
+    return BAND_NAMES[-1]
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def derive(data):
+    """Derived metrics for a single record"""
+    dew = dew_point(data['temperature'], data['humidity'])
+    return {
+        'temperature': data['temperature'],
+        'humidity': data['humidity'],
+        'dew_point': _round(dew),
+        'heat_index': _round(heat_index(data['temperature'], data['humidity'])),
+        'comfort': comfort_band(dew)
+    }
+
+
+def derive_loop(records):
+    """Per-record reference implementation for {location: record} input"""
+    return {location: derive(data) for location, data in records.items()}
+
+
+def derive_batch(records):
+    """Derived metrics for many records at once using vectorized math"""
+    if np is None or not records:
+        return derive_loop(records)
+
+    locations = list(records)
+    temperature = np.fromiter((records[name]['temperature'] for name in locations),
+                              dtype=np.float64, count=len(locations))
+    humidity = np.fromiter((records[name]['humidity'] for name in locations),
+                           dtype=np.float64, count=len(locations))
+
+    # Dew point; none for zero humidity or outside the formula's range
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = np.log(humidity / 100) + MAGNUS_A * temperature / (MAGNUS_B + temperature)
+        dew = MAGNUS_B * gamma / (MAGNUS_A - gamma)
+    no_dew = (humidity <= 0) | (temperature < MAGNUS_RANGE[0]) | (temperature > MAGNUS_RANGE[1])
+
+    # Heat index: the simple formula below 80F, the full regression above
+    t = temperature * 9 / 5 + 32
+    simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + humidity * 0.094)
+    full = (-42.379 + 2.04901523 * t + 10.14333127 * humidity - 0.22475541 * t * humidity
+            - 0.00683783 * t * t - 0.05481717 * humidity * humidity
+            + 0.00122874 * t * t * humidity + 0.00085282 * t * humidity * humidity
+            - 0.00000199 * t * t * humidity * humidity)
+    dry = (humidity < 13) & (t >= 80) & (t <= 112)
+    with np.errstate(invalid='ignore'):
+        full = np.where(dry, full - (13 - humidity) / 4 * np.sqrt((17 - np.abs(t - 95)) / 17), full)
+    damp = (humidity > 85) & (t >= 80) & (t <= 87)
+    full = np.where(damp, full + (humidity - 85) / 10 * (87 - t) / 5, full)
+    heat = (np.where((simple + t) / 2 < 80, simple, full) - 32) * 5 / 9
+
+    bands = np.searchsorted(np.array(BAND_LIMITS), np.where(no_dew, -np.inf, dew), side='right')
+
+    # Rounded with the same round() as derive(): np.round scales by 100 first
+    # and disagrees with it on some values
+    dew_values = [round(value, 2) for value in dew.tolist()]
+    heat_values = [round(value, 2) for value in heat.tolist()]
+    no_dew = no_dew.tolist()
+    bands = bands.tolist()
+
+    return {
+        name: {
+            'temperature': records[name]['temperature'],
+            'humidity': records[name]['humidity'],
+            'dew_point': None if no_dew[index] else dew_values[index],
+            'heat_index': heat_values[index],
+            'comfort': BAND_NAMES[bands[index]]
+        }
+        for index, name in enumerate(locations)
+    }
+
+
+class DerivedCache:
+    """Small LRU of derived results keyed by store generation and query"""
+
+    def __init__(self, size=32):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = value
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return value
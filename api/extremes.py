@@ -0,0 +1,100 @@
+"""Top-K queries over temperature and humidity"""
+import heapq
+import threading
+from bisect import bisect_left, insort
+from itertools import islice
+
+EXTREME_FIELDS = ('temperature', 'humidity')
+ORDERS = ('highest', 'lowest')
+MAX_K = 1000
+
+
+def _matches(data, conditions):
+    return not conditions or conditions.lower() in data['conditions'].lower()
+
+
+def top_k_scan(store, field, k, order='highest', conditions=None):
+    """Partial selection with a bounded heap when no index is available
+
+    Costs O(N log K) instead of sorting the whole store.
+    """
+    candidates = ((data[field], location) for location, data in store.items()
+                  if _matches(data, conditions))
+    select = heapq.nlargest if order == 'highest' else heapq.nsmallest
+    return [location for _, location in select(k, candidates)]
+
+
+class ExtremesIndex:
+    """Sorted (value, location) lists per field, kept current from store events
+
+    Queries walk the sorted list from the requested end, so a top-K read
+    costs O(K) plus any records skipped by a conditions filter.
+    """
+
+    def __init__(self, store=None):
+        if store is None:
+            from weather_api_next.api.routes import weather_data as store
+        self.store = store
+        self._lock = threading.Lock()
+        self._rebuild()
+        store.subscribe(self._on_change)
+
+    def init_app(self, app):
+        """Register the index on a Flask application"""
+        app.extensions['weather_extremes'] = self
+        return self
+
+    def top_k(self, field, k, order='highest', conditions=None):
+        """Locations with the ``k`` highest or lowest values of ``field``"""
+        with self._lock:
+            entries = self._sorted[field]
+            walk = reversed(entries) if order == 'highest' else iter(entries)
+            if not conditions:
+                return [location for _, location in islice(walk, k)]
+
+            store = self.store
+            found = []
+            for _, location in walk:
+                # A concurrent delete may have removed the record already
+                data = store.get(location)
+                if data is not None and _matches(data, conditions):
+                    found.append(location)
+                    if len(found) == k:
+                        break
+            return found
+
+    def _rebuild(self):
+        with self._lock:
+            self._values = {field: {} for field in EXTREME_FIELDS}
+            self._sorted = {}
+            for field in EXTREME_FIELDS:
+                values = self._values[field]
+                for location, data in self.store.items():
+                    values[location] = data[field]
+                self._sorted[field] = sorted((value, location) for location, value in values.items())
+
+    def _remove(self, field, location):
+        old = self._values[field].pop(location, None)
+        if old is not None:
+            entries = self._sorted[field]
+            del entries[bisect_left(entries, (old, location))]
+
+    def _apply(self, location, record):
+        for field in EXTREME_FIELDS:
+            self._remove(field, location)
+            if record is not None:
+                self._values[field][location] = record[field]
+                insort(self._sorted[field], (record[field], location))
+
+    def _on_change(self, event, location, record):
+        # Re-sorting beats many list insertions once an update is large
+        if event == 'clear' or (event == 'bulk' and len(record) * 8 > len(self.store)):
+            self._rebuild()
+            return
+
+        with self._lock:
+            if event == 'bulk':
+                for name, data in record.items():
+                    self._apply(name, data)
+            else:
+                self._apply(location, record if event == 'set' else None)
@@ -0,0 +1,129 @@
+"""Content negotiation for JSON and compact binary wire formats
+
+MessagePack, CBOR and Arrow are optional: each format is only offered
+when its library is installed, and JSON is always the fallback.
+"""
+from flask import Response, jsonify, request
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover - optional dependency
+    cbor2 = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+CBOR = 'application/cbor'
+ARROW = 'application/vnd.apache.arrow.stream'
+
+# Alternative spellings clients commonly send for MessagePack
+MSGPACK_ALIASES = (MSGPACK, 'application/x-msgpack', 'application/vnd.msgpack')
+
+def encode_msgpack(payload):
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def encode_cbor(payload):
+    return cbor2.dumps(payload)
+
+
+def encode_arrow(locations):
+    """Encode a {location: record} mapping as an Arrow IPC stream"""
+    table = pyarrow.table({
+        'location': pyarrow.array(list(locations), type=pyarrow.string()),
+        'temperature': pyarrow.array([data['temperature'] for data in locations.values()],
+                                     type=pyarrow.float64()),
+        'conditions': pyarrow.array([data['conditions'] for data in locations.values()],
+                                    type=pyarrow.string()),
+        'humidity': pyarrow.array([data['humidity'] for data in locations.values()],
+                                  type=pyarrow.float64())
+    })
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def response_types(arrow=False):
+    """Mimetypes this server can currently produce, JSON first"""
+    types = [JSON]
+    if msgpack is not None:
+        types.extend(MSGPACK_ALIASES)
+    if cbor2 is not None:
+        types.append(CBOR)
+    if arrow and pyarrow is not None:
+        types.append(ARROW)
+    return types
+
+
+def negotiate(arrow=False):
+    """Pick the response mimetype from the Accept header"""
+    return request.accept_mimetypes.best_match(response_types(arrow), default=JSON)
+
+
+def respond(payload, status=200, arrow=False):
+    """Serialize a payload in the format the client asked for
+
+    ``arrow`` marks ``payload`` as a {location: record} mapping that may
+    also be sent as a columnar Arrow table.
+    """
+    mimetype = negotiate(arrow)
+
+    if mimetype in MSGPACK_ALIASES:
+        response = Response(encode_msgpack(payload), status=status, mimetype=mimetype)
+    elif mimetype == CBOR:
+        response = Response(encode_cbor(payload), status=status, mimetype=mimetype)
+    elif mimetype == ARROW:
+        response = Response(encode_arrow(payload), status=status, mimetype=mimetype)
+    else:
+        response = jsonify(payload)
+        response.status_code = status
+
+    # The JSON body also depends on Accept, so caches must key on it too
+    response.vary.add('Accept')
+    return response
+
+
+def has_supported_body():
+    """Whether the request body is in a format we can decode"""
+    if request.is_json:
+        return True
+    mimetype = request.mimetype
+    return ((mimetype in MSGPACK_ALIASES and msgpack is not None)
+            or (mimetype == CBOR and cbor2 is not None))
+
+
+def get_request_data():
+    """Decode a JSON, MessagePack or CBOR request body into a dict
+
+    Raises APIError for bodies that cannot be decoded or are not an object.
+    """
+    from weather_api_next.api import APIError
+
+    if request.is_json:
+        data = request.get_json()
+    else:
+        body = request.get_data()
+        try:
+            if request.mimetype in MSGPACK_ALIASES and msgpack is not None:
+                data = msgpack.unpackb(body, raw=False)
+            elif request.mimetype == CBOR and cbor2 is not None:
+                data = cbor2.loads(body)
+            else:
+                data = None
+        except Exception:
+            raise APIError('Request body could not be decoded')
+
+    if not isinstance(data, dict):
+        raise APIError('Request body must be an object')
+    return data
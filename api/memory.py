@@ -0,0 +1,118 @@
+"""Approximate memory footprint of the store and derived structures"""
+import sys
+import tracemalloc
+from collections import deque
+from itertools import islice
+
+CONTAINERS = (dict, list, tuple, set, frozenset, deque)
+
+
+def _sample(items, size, limit):
+    """Every n-th item so that at most ``limit`` are visited"""
+    step = max(size // limit, 1)
+    return list(islice(items, 0, None, step))[:limit]
+
+
+def deep_sizeof(obj, seen=None, sample=None):
+    """Approximate deep size in bytes of nested builtin containers
+
+    Objects already in ``seen`` (by id) are not counted again, so shared
+    values such as interned strings are counted once. Containers with more
+    than ``sample`` items are estimated from an evenly spaced sample.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if not isinstance(obj, CONTAINERS) or not obj:
+        return size
+
+    # Walk a copy: writers may resize the live store or log meanwhile, and
+    # the copy is a single C-level pass without any Python code in between
+    if isinstance(obj, dict):
+        def item_size(item):
+            return deep_sizeof(item[0], seen, sample) + deep_sizeof(item[1], seen, sample)
+        items = list(obj.items())
+    else:
+        def item_size(item):
+            return deep_sizeof(item, seen, sample)
+        items = list(obj)
+
+    count = len(items)
+    if sample is None or count <= sample:
+        return size + sum(item_size(item) for item in items)
+
+    picked = _sample(items, count, sample)
+    sampled = sum(item_size(item) for item in picked)
+    return size + int(sampled * count / len(picked))
+
+
+def component_size(component, exclude, sample=None):
+    """Deep size of the container attributes of a helper object
+
+    Only builtin containers are followed, so sessions, thread pools and
+    references back to the store (listed in ``exclude``) are not counted.
+    """
+    seen = set(exclude)
+    return sum(deep_sizeof(value, seen, sample) for value in list(vars(component).values())
+               if isinstance(value, CONTAINERS))
+
+
+def string_sharing(store, sample=None):
+    """How much repeated ``conditions`` strings cost and save
+
+    ``shared_bytes`` is memory already saved because records reference the
+    same string object; ``internable_bytes`` is what interning the
+    remaining equal-but-distinct copies would additionally save.
+    """
+    records = list(store.values())
+    count = len(records)
+    if sample is not None and count > sample:
+        records = _sample(records, count, sample)
+    if not records:
+        return {'references': 0, 'distinct_values': 0, 'shared_bytes': 0, 'internable_bytes': 0}
+
+    objects = {}
+    values = set()
+    references = 0
+    for data in records:
+        value = data.get('conditions')
+        if isinstance(value, str):
+            references += 1
+            objects[id(value)] = value
+            values.add(value)
+
+    average = sum(sys.getsizeof(value) for value in objects.values()) / max(len(objects), 1)
+    scale = count / len(records)
+    return {
+        'references': int(references * scale),
+        'distinct_values': len(values),
+        'shared_bytes': int((references - len(objects)) * average * scale),
+        'internable_bytes': int((len(objects) - len(values)) * average * scale)
+    }
+
+
+def store_footprint(store, sample=None):
+    """Deep size estimate of the store plus per-record averages"""
+    count = len(store)
+    total = deep_sizeof(store, sample=sample)
+    return {
+        'locations': count,
+        'approximate': sample is not None and count > sample,
+        'total_bytes': total,
+        'table_bytes': sys.getsizeof(store),
+        'per_record_bytes': (total - sys.getsizeof(store)) / count if count else None
+    }
+
+
+def top_allocations(limit=10):
+    """Largest allocation sites from tracemalloc, or None when not tracing"""
+    if not tracemalloc.is_tracing():
+        return None
+
+    stats = tracemalloc.take_snapshot().statistics('lineno')[:limit]
+    return [{'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+             'size_bytes': stat.size, 'count': stat.count} for stat in stats]
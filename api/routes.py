@@ -1,8 +1,18 @@
-from flask import jsonify, request
+import math
+
+from flask import current_app, jsonify, request
 from weather_api_next.api import api_bp
+from weather_api_next.api.store import WeatherStore
+from weather_api_next.api.formats import get_request_data, has_supported_body, respond
+from weather_api_next.api.derived import derive, derive_batch
+from weather_api_next.api.aggregation import (
+    BUCKET_MODES, GROUP_BY_FIELDS, HISTOGRAM_FIELDS, HistogramError, aggregate
+)
+from weather_api_next.api.extremes import EXTREME_FIELDS, MAX_K, ORDERS, top_k_scan
+from weather_api_next.provider import ProviderError
 
 # In-memory storage for demo purposes
-weather_data = {
+weather_data = WeatherStore({
     'new_york': {
         'temperature': 20,
         'conditions': 'Partly Cloudy',
@@ -18,7 +28,10 @@ weather_data = {
         'conditions': 'Sunny',
         'humidity': 50
     }
-}
+})
+
+# Names of static /weather/* routes, which would shadow a location's URL
+RESERVED_LOCATIONS = ('aggregate', 'batch', 'derived', 'expiry', 'extremes', 'search', 'stats')
 
 def validate_location_name(location):
     """Validate that a location name contains only valid characters"""
@@ -31,6 +44,9 @@ def validate_location_name(location):
     if len(location) < 2 or len(location) > 50:
         return False, "Location name must be between 2 and 50 characters"
 
+    if location.lower() in RESERVED_LOCATIONS:
+        return False, f"Location name '{location}' is reserved"
+
     return True, ""
 
 def validate_weather_data(data):
@@ -51,56 +67,117 @@ def validate_weather_data(data):
     if not isinstance(data.get('conditions'), str):
         return False, "Conditions must be a string"
 
+    # NaN and infinities do not order, which breaks sorting and statistics
+    if not math.isfinite(data['temperature']) or not math.isfinite(data['humidity']):
+        return False, "Temperature and humidity must be finite numbers"
+
     # Value validation
     if data.get('humidity') < 0 or data.get('humidity') > 100:
         return False, "Humidity must be between 0 and 100"
 
     return True, ""
 
+def validate_ttl(ttl):
+    """Validate an optional per-record time-to-live in seconds"""
+    if ttl is None:
+        return True, ""
+
+    if isinstance(ttl, bool) or not isinstance(ttl, (int, float)) or ttl <= 0:
+        return False, "ttl must be a positive number of seconds"
+
+    return True, ""
+
+def get_provider():
+    """Return the upstream weather provider for the current app, if any"""
+    return current_app.extensions.get('weather_provider')
+
+def forget_upstream(location):
+    """Mark a location as locally managed ahead of a direct write"""
+    provider = get_provider()
+    if provider is not None:
+        provider.forget(location)
+
+def schedule_expiry(location, ttl):
+    """Apply a per-record TTL given with a write"""
+    expiry = current_app.extensions.get('weather_expiry')
+    if expiry is not None and ttl is not None:
+        expiry.schedule(location, ttl)
+
+@api_bp.before_request
+def expire_stale_records():
+    """Drop records whose TTL has passed before serving the request"""
+    expiry = current_app.extensions.get('weather_expiry')
+    if expiry is not None:
+        expiry.sweep()
+
 @api_bp.route('/weather', methods=['GET'])
 def get_all_weather():
     """Get weather data for all locations"""
-    return jsonify(weather_data)
+    return respond(weather_data, arrow=True)
 
 @api_bp.route('/weather/<location>', methods=['GET'])
 def get_weather(location):
     """Get weather data for a specific location"""
+    provider = get_provider()
+    if provider is not None:
+        try:
+            record = provider.get(location)
+        except ProviderError as exc:
+            return jsonify({'error': str(exc)}), 502
+
+        if record is None:
+            return jsonify({'error': 'Location not found'}), 404
+        return respond(record)
+
     if location.lower() not in weather_data:
         return jsonify({'error': 'Location not found'}), 404
 
-    return jsonify(weather_data[location.lower()])
+    return respond(weather_data[location.lower()])
 
 @api_bp.route('/weather/<location>', methods=['PUT'])
 def update_weather(location):
     """Update weather data for a specific location"""
-    if not request.is_json:
+    if not has_supported_body():
         return jsonify({'error': 'Request must be JSON'}), 400
 
     if location.lower() not in weather_data:
         return jsonify({'error': 'Location not found'}), 404
 
-    data = request.get_json()
+    data = get_request_data()
+    ttl = data.pop('ttl', None)
 
     valid, message = validate_weather_data(data)
+    if valid:
+        valid, message = validate_ttl(ttl)
     if not valid:
         return jsonify({'error': message}), 400
 
-    weather_data[location.lower()].update(data)
+    # Before the write, so an upstream fetch already running cannot replace it
+    forget_upstream(location)
+
+    # A per-record TTL must be applied after listeners have seen the write
+    write_behind = current_app.extensions.get('weather_write_behind')
+    if write_behind is not None:
+        write_behind.merge(location.lower(), data, defer=ttl is None)
+    else:
+        weather_data.merge(location.lower(), data)
+    schedule_expiry(location.lower(), ttl)
 
-    return jsonify(weather_data[location.lower()])
+    return respond(weather_data[location.lower()])
 
 @api_bp.route('/weather', methods=['POST'])
 def create_weather():
     """Add weather data for a new location"""
-    if not request.is_json:
+    if not has_supported_body():
         return jsonify({'error': 'Request must be JSON'}), 400
 
-    data = request.get_json()
+    data = get_request_data()
 
     if 'location' not in data:
         return jsonify({'error': 'Location is required'}), 400
 
     location = data.pop('location').lower()
+    ttl = data.pop('ttl', None)
 
     # Validate location name
     valid, message = validate_location_name(location)
@@ -111,12 +188,16 @@ def create_weather():
         return jsonify({'error': 'Location already exists'}), 409
 
     valid, message = validate_weather_data(data)
+    if valid:
+        valid, message = validate_ttl(ttl)
     if not valid:
         return jsonify({'error': message}), 400
 
+    forget_upstream(location)
     weather_data[location] = data
+    schedule_expiry(location, ttl)
 
-    return jsonify(weather_data[location]), 201
+    return respond(weather_data[location], 201)
 
 @api_bp.route('/weather/<location>', methods=['DELETE'])
 def delete_weather(location):
@@ -124,7 +205,8 @@ def delete_weather(location):
     if location.lower() not in weather_data:
         return jsonify({'error': 'Location not found'}), 404
 
-    del weather_data[location.lower()]
+    forget_upstream(location)
+    weather_data.pop(location.lower(), None)
 
     return '', 204
 
@@ -132,52 +214,60 @@ def delete_weather(location):
 
 
 
-@api_bp.route('/weather/search', methods=['GET'])
-def search_weather():
-    """Search weather data by conditions or temperature ranges"""
-    conditions = request.args.get('conditions')
-    min_temp = request.args.get('min_temp')
-    max_temp = request.args.get('max_temp')
+def parse_search_filters(args):
+    """Parse the conditions/min_temp/max_temp filters shared by query endpoints"""
+    filters = {'conditions': args.get('conditions') or None}
 
     # Validate temperature inputs
-    if min_temp:
-        try:
-            min_temp = float(min_temp)
-        except ValueError:
-            return jsonify({'error': 'min_temp must be a number'}), 400
+    for name in ('min_temp', 'max_temp'):
+        value = args.get(name)
+        if value:
+            try:
+                value = float(value)
+            except ValueError:
+                return None, f"{name} must be a number"
+        filters[name] = value if value != '' else None
 
-    if max_temp:
-        try:
-            max_temp = float(max_temp)
-        except ValueError:
-            return jsonify({'error': 'max_temp must be a number'}), 400
+    return filters, ""
 
-    results = {}
+def matches_filters(data, filters):
+    """Check whether a weather record passes the parsed search filters"""
+    conditions = filters.get('conditions')
+    min_temp = filters.get('min_temp')
+    max_temp = filters.get('max_temp')
 
-    for location, data in weather_data.items():
-        # Filter by conditions
-        if conditions and conditions.lower() not in data['conditions'].lower():
-            continue
+    # Filter by conditions
+    if conditions and conditions.lower() not in data['conditions'].lower():
+        return False
 
-        # Filter by minimum temperature
-        if min_temp and data['temperature'] < float(min_temp):
-            continue
+    # Filter by minimum temperature
+    if min_temp is not None and data['temperature'] < min_temp:
+        return False
 
-        # Filter by maximum temperature
-        if max_temp and data['temperature'] > float(max_temp):
-            continue
+    # Filter by maximum temperature
+    if max_temp is not None and data['temperature'] > max_temp:
+        return False
 
-        # Add to results if it passed all filters
-        results[location] = data
+    return True
 
-    return jsonify(results)
+@api_bp.route('/weather/search', methods=['GET'])
+def search_weather():
+    """Search weather data by conditions or temperature ranges"""
+    filters, message = parse_search_filters(request.args)
+    if filters is None:
+        return jsonify({'error': message}), 400
+
+    results = {location: data for location, data in weather_data.items()
+               if matches_filters(data, filters)}
+
+    return respond(results)
 
 
 @api_bp.route('/weather/stats', methods=['GET'])
 def get_weather_stats():
     """Get statistics about weather data"""
     if not weather_data:
-        return jsonify({
+        return respond({
             'count': 0,
             'avg_temperature': None,
             'min_temperature': None,
@@ -196,5 +286,191 @@ def get_weather_stats():
         'avg_humidity': sum(humidities) / len(humidities) if humidities else None
     }
 
-    return jsonify(stats)
+    return respond(stats)
+
+
+
+def parse_batch_locations():
+    """Read the requested locations from the query string or request body
+
+    Returns the list of names, or None and an error message.
+    """
+    if request.method == 'POST':
+        if not has_supported_body():
+            return None, 'Request must be JSON'
+
+        data = get_request_data()
+        locations = data.get('locations')
+        if not isinstance(locations, list) or not all(isinstance(name, str) for name in locations):
+            return None, 'locations must be a list of strings'
+    else:
+        locations = [name for name in request.args.get('locations', '').split(',') if name.strip()]
+
+    if not locations:
+        return None, 'At least one location is required'
+
+    max_locations = current_app.config.get('WEATHER_BATCH_MAX_LOCATIONS', 500)
+    if len(locations) > max_locations:
+        return None, f'At most {max_locations} locations per request'
+
+    return locations, ""
+
+@api_bp.route('/weather/batch', methods=['GET', 'POST'])
+def get_weather_batch():
+    """Get weather data for several locations in one request"""
+    locations, message = parse_batch_locations()
+    if locations is None:
+        return jsonify({'error': message}), 400
+
+    results = {}
+    missing = []
+    seen = set()
+
+    # Single pass over the requested names, keeping the first occurrence of each
+    for name in locations:
+        location = name.strip().lower()
+        if location in seen:
+            continue
+        seen.add(location)
+
+        record = weather_data.get(location)
+        if record is None:
+            missing.append(location)
+        else:
+            results[location] = record
+
+    return respond({'results': results, 'missing': missing})
+
+
+def parse_aggregate_options(args):
+    """Parse the grouping, histogram and filter options of an aggregation
+
+    Returns the keyword arguments for aggregate() (less the records), the
+    parsed filters, or None and an error message.
+    """
+    filters, message = parse_search_filters(args)
+    if filters is None:
+        return None, None, message
+
+    group_by = args.get('group_by')
+    if group_by and group_by not in GROUP_BY_FIELDS:
+        return None, None, f"group_by must be one of: {', '.join(GROUP_BY_FIELDS)}"
+
+    histograms = [field for field in args.get('histogram', '').split(',') if field]
+    invalid = [field for field in histograms if field not in HISTOGRAM_FIELDS]
+    if invalid:
+        return None, None, f"histogram must be one of: {', '.join(HISTOGRAM_FIELDS)}"
+
+    bucket_mode = args.get('buckets', 'fixed')
+    if bucket_mode not in BUCKET_MODES:
+        return None, None, f"buckets must be one of: {', '.join(BUCKET_MODES)}"
+
+    try:
+        bucket_width = float(args.get('bucket_width', 10))
+        quantiles = int(args.get('quantiles', 4))
+    except ValueError:
+        return None, None, 'bucket_width and quantiles must be numbers'
+
+    if not math.isfinite(bucket_width) or bucket_width <= 0:
+        return None, None, 'bucket_width must be a positive finite number'
+
+    if quantiles < 1 or quantiles > 100:
+        return None, None, 'quantiles must be between 1 and 100'
+
+    options = {
+        'group_by': group_by,
+        'histograms': histograms,
+        'bucket_mode': bucket_mode,
+        'bucket_width': bucket_width,
+        'quantiles': quantiles
+    }
+    return options, filters, ""
+
+@api_bp.route('/weather/aggregate', methods=['GET'])
+def aggregate_weather():
+    """Group-by and histogram aggregation over (optionally filtered) weather data"""
+    options, filters, message = parse_aggregate_options(request.args)
+    if options is None:
+        return jsonify({'error': message}), 400
+
+    try:
+        result = aggregate(weather_data.values(), predicate=lambda data: matches_filters(data, filters),
+                           **options)
+    except HistogramError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    return respond(result)
+
+
+@api_bp.route('/weather/extremes', methods=['GET'])
+def get_weather_extremes():
+    """Get the K hottest, coldest, most or least humid locations"""
+    field = request.args.get('field', 'temperature')
+    if field not in EXTREME_FIELDS:
+        return jsonify({'error': f"field must be one of: {', '.join(EXTREME_FIELDS)}"}), 400
+
+    order = request.args.get('order', 'highest')
+    if order not in ORDERS:
+        return jsonify({'error': f"order must be one of: {', '.join(ORDERS)}"}), 400
+
+    try:
+        k = int(request.args.get('k', 10))
+    except ValueError:
+        return jsonify({'error': 'k must be an integer'}), 400
+
+    if k < 1 or k > MAX_K:
+        return jsonify({'error': f'k must be between 1 and {MAX_K}'}), 400
+
+    conditions = request.args.get('conditions') or None
+    index = current_app.extensions.get('weather_extremes')
+    if index is not None:
+        locations = index.top_k(field, k, order, conditions)
+    else:
+        locations = top_k_scan(weather_data, field, k, order, conditions)
+
+    # A location may have been removed since the index was read
+    results = []
+    for location in locations:
+        data = weather_data.get(location)
+        if data is not None:
+            results.append({'location': location, **data})
+
+    return respond({'field': field, 'order': order, 'results': results})
+
+
+@api_bp.route('/weather/expiry', methods=['GET'])
+def get_expiry_stats():
+    """Get counters for TTL-based expiry of stale readings"""
+    expiry = current_app.extensions.get('weather_expiry')
+    if expiry is None:
+        return respond({'enabled': False})
+
+    return respond({'enabled': True, **expiry.stats()})
+
+
+@api_bp.route('/weather/<location>/derived', methods=['GET'])
+def get_derived_metrics(location):
+    """Get dew point, heat index and comfort band for a specific location"""
+    if location.lower() not in weather_data:
+        return jsonify({'error': 'Location not found'}), 404
+
+    return respond(derive(weather_data[location.lower()]))
+
+@api_bp.route('/weather/derived', methods=['GET'])
+def get_derived_metrics_batch():
+    """Get derived metrics for all locations or those matching the search filters"""
+    filters, message = parse_search_filters(request.args)
+    if filters is None:
+        return jsonify({'error': message}), 400
+
+    def compute():
+        records = {location: data for location, data in weather_data.items()
+                   if matches_filters(data, filters)}
+        return derive_batch(records)
+
+    cache = current_app.extensions.get('weather_derived_cache')
+    if cache is None or not cache.size:
+        return respond(compute())
 
+    key = (weather_data.generation, tuple(sorted(filters.items())))
+    return respond(cache.get_or_compute(key, compute))
@@ -0,0 +1,129 @@
+"""In-memory weather store that reports its own mutations"""
+import os
+import threading
+import weakref
+
+# Every store, so their locks can be replaced in a forked child
+_stores = weakref.WeakValueDictionary()
+
+
+class WeatherStore(dict):
+    """A location -> record dict that tracks changes
+
+    Behaves exactly like a dict, but every mutation bumps ``generation`` and
+    is reported to subscribed listeners as ``listener(event, location, record)``
+    where event is one of 'set', 'delete', 'clear' or 'bulk' (for update(),
+    with ``record`` holding the mapping of new records).
+
+    Each mutation and its notification happen under ``lock``, so listeners
+    see changes in the order they were made. Listeners run with the lock
+    held and must not wait on a thread that is itself writing to the store.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.generation = 0
+        self.lock = threading.RLock()
+        self._listeners = []
+        _stores[id(self)] = self
+
+    def subscribe(self, listener):
+        """Register a change listener
+
+        Bound methods are held weakly so that per-app components go away
+        with their app instead of accumulating on the shared store.
+        """
+        if hasattr(listener, '__self__'):
+            ref = weakref.WeakMethod(listener)
+        else:
+            ref = lambda: listener  # noqa: E731
+        self._listeners.append(ref)
+
+    def unsubscribe(self, listener):
+        """Remove a previously registered listener"""
+        self._listeners = [ref for ref in self._listeners if ref() not in (None, listener)]
+
+    def notify(self, event, location=None, record=None):
+        """Record a change and pass it on to listeners"""
+        with self.lock:
+            self.generation += 1
+            dead = False
+            for ref in list(self._listeners):
+                listener = ref()
+                if listener is None:
+                    dead = True
+                else:
+                    listener(event, location, record)
+            if dead:
+                self._listeners = [ref for ref in self._listeners if ref() is not None]
+
+    def merge(self, location, data, notify=True):
+        """Update an existing record in place
+
+        With ``notify=False`` listeners are not told yet (the caller reports
+        the change later), but ``generation`` still moves so caches keyed on
+        it never serve data older than the record itself.
+        """
+        with self.lock:
+            record = dict.__getitem__(self, location)
+            record.update(data)
+            if notify:
+                self.notify('set', location, record)
+            else:
+                self.generation += 1
+            return record
+
+    def __setitem__(self, location, record):
+        with self.lock:
+            super().__setitem__(location, record)
+            self.notify('set', location, record)
+
+    def __delitem__(self, location):
+        with self.lock:
+            super().__delitem__(location)
+            self.notify('delete', location)
+
+    def pop(self, location, *default):
+        with self.lock:
+            if location not in self:
+                return super().pop(location, *default)
+            record = super().pop(location)
+            self.notify('delete', location)
+            return record
+
+    def popitem(self):
+        with self.lock:
+            location, record = super().popitem()
+            self.notify('delete', location)
+            return location, record
+
+    def setdefault(self, location, default=None):
+        with self.lock:
+            if location not in self:
+                self[location] = default
+            return dict.__getitem__(self, location)
+
+    def update(self, *args, **kwargs):
+        records = dict(*args, **kwargs)
+        with self.lock:
+            super().update(records)
+            self.notify('bulk', None, records)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        with self.lock:
+            super().clear()
+            self.notify('clear')
+
+
+def _reset_locks():
+    # Another thread may have held a lock at fork and does not exist in the child
+    for store in list(_stores.values()):
+        store.lock = threading.RLock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_locks)
@@ -1,6 +1,7 @@
+import os
 from weather_api_next import create_app
 
-app = create_app()
+app = create_app(os.environ.get('FLASK_CONFIG', 'default'))
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,44 @@
+"""Compare vectorized and per-record derived metrics computation
+
+Usage (from the directory containing the package):
+
+    python -m weather_api_next.benchmarks.derived_metrics --locations 100000 --repeat 5
+"""
+import argparse
+import random
+import time
+
+from weather_api_next.api import derived
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--locations', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    records = {
+        f'station {index}': {
+            'temperature': round(rng.uniform(-30, 45), 1),
+            'conditions': 'Clear',
+            'humidity': rng.randint(0, 100)
+        }
+        for index in range(args.locations)
+    }
+
+    if derived.np is None:
+        print('NumPy is not installed; derive_batch falls back to the loop')
+
+    print(f"{'implementation':<16}{'best ms':>10}{'records/s':>14}")
+    for name, func in (('python loop', derived.derive_loop), ('vectorized', derived.derive_batch)):
+        best = float('inf')
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            func(records)
+            best = min(best, time.perf_counter() - started)
+        print(f'{name:<16}{best * 1e3:>10.1f}{args.locations / best:>14.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Compare single-location read throughput with and without the fast path
+
+Usage (from the directory containing the package):
+
+    python -m weather_api_next.benchmarks.fast_path --requests 50000
+
+Calls the WSGI application directly, without a server or network, so the
+numbers isolate the per-request cost inside the app.
+"""
+import argparse
+import io
+import time
+
+from weather_api_next import create_app
+from weather_api_next.api.routes import weather_data
+from weather_api_next.config import TestingConfig
+
+
+def make_environ(path):
+    return {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def run(app, paths, count):
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    started = time.perf_counter()
+    for index in range(count):
+        body = app(make_environ(paths[index % len(paths)]), start_response)
+        b''.join(body)
+        if hasattr(body, 'close'):
+            body.close()
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=50000)
+    parser.add_argument('--locations', type=int, default=1000)
+    args = parser.parse_args()
+
+    weather_data.clear()
+    weather_data.update({f'station{index}': {'temperature': index % 40, 'conditions': 'Clear',
+                                             'humidity': index % 100}
+                         for index in range(args.locations)})
+    # One miss in ten, as with lookups for unknown stations
+    paths = [f'/api/v1/weather/Station{index}' if index % 10 else '/api/v1/weather/nowhere'
+             for index in range(args.locations)]
+
+    flask_app = create_app('testing')
+    TestingConfig.WEATHER_FAST_PATH = True
+    fast_app = create_app('testing')
+
+    flask_rate = run(flask_app, paths, args.requests)
+    fast_rate = run(fast_app, paths, args.requests)
+    print(f"{'path':<10}{'requests/s':>14}")
+    print(f"{'flask':<10}{flask_rate:>14.0f}")
+    print(f"{'fast':<10}{fast_rate:>14.0f}")
+    print(f'speedup   {fast_rate / flask_rate:>13.1f}x')
+
+
+if __name__ == '__main__':
+    main()
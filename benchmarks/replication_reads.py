@@ -0,0 +1,99 @@
+"""Show read throughput scaling with the number of followers
+
+Usage (from the directory containing the package):
+
+    python -m weather_api_next.benchmarks.replication_reads --followers 1,2,4 --clients 8
+
+Starts a leader, seeds it, then for each follower count starts that many
+follower processes, waits for them to catch up and drives GET requests
+at them from several client processes for a fixed duration.
+
+Each follower is one server process, so reads only scale with followers
+while there are idle cores: on a host with fewer cores than followers
+plus clients the numbers stay flat. tests/test_replication.py asserts
+the scaling on hosts with at least four cores.
+"""
+import argparse
+import multiprocessing
+import time
+
+import requests
+
+from weather_api_next.cluster import start_node
+
+
+def client_loop(args):
+    urls, locations, duration = args
+    session = requests.Session()
+    done = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        url = urls[done % len(urls)]
+        session.get(f'{url}/api/v1/weather/{locations[done % len(locations)]}').raise_for_status()
+        done += 1
+    return done
+
+
+def wait_caught_up(follower, position, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status = requests.get(f'{follower.url}/api/v1/replication/status').json()
+            if status['position'] >= position:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError('Follower did not catch up')
+
+
+def seed_leader(leader, count):
+    """Write ``count`` locations to the leader, returning the names and log position"""
+    session = requests.Session()
+    locations = [f'station{index}' for index in range(count)]
+    for location in locations:
+        session.post(f'{leader.url}/api/v1/weather', json={
+            'location': location, 'temperature': 20, 'conditions': 'Clear', 'humidity': 50
+        }).raise_for_status()
+    position = session.get(f'{leader.url}/api/v1/replication/status').json()['position']
+    return locations, position
+
+
+def read_throughput(pool, leader, followers, locations, position, clients, duration):
+    """Reads per second that ``clients`` processes get from ``followers`` fresh followers"""
+    nodes = [start_node({'WEATHER_REPLICATION_ROLE': 'follower', 'WEATHER_LEADER_URL': leader.url},
+                        clear=False)
+             for _ in range(followers)]
+    try:
+        for node in nodes:
+            wait_caught_up(node, position)
+        urls = [node.url for node in nodes]
+        return sum(pool.map(client_loop, [(urls, locations, duration)] * clients)) / duration
+    finally:
+        for node in nodes:
+            node.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--followers', default='1,2,4')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--locations', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    leader = start_node({'WEATHER_REPLICATION_ROLE': 'leader'})
+    try:
+        locations, position = seed_leader(leader, args.locations)
+
+        print(f"{'followers':>10}{'reads/s':>12}")
+        with multiprocessing.get_context('spawn').Pool(args.clients) as pool:
+            for count in (int(value) for value in args.followers.split(',')):
+                rate = read_throughput(pool, leader, count, locations, position, args.clients, args.duration)
+                print(f'{count:>10}{rate:>12.0f}')
+    finally:
+        leader.stop()
+
+
+if __name__ == '__main__':
+    main()
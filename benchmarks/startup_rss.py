@@ -0,0 +1,135 @@
+"""Measure gunicorn startup time and per-worker memory with and without preloading
+
+Usage (from the directory containing the package):
+
+    python -m weather_api_next.benchmarks.startup_rss --locations 200000 --workers 4
+
+A synthetic dataset is generated unless --data is given. For each mode the
+script starts gunicorn, waits until all workers are up and serving, then
+reads RSS, PSS (proportional share) and private memory from /proc. With
+preloading the PSS and private figures per worker should drop sharply
+because the dataset pages are shared with the master.
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+CONDITIONS = ('Sunny', 'Cloudy', 'Rainy', 'Snow', 'Fog', 'Partly Cloudy', 'Windy')
+
+
+def generate_dataset(path, count):
+    """Write a synthetic JSON dataset in the GET /api/v1/weather shape"""
+    rng = random.Random(42)
+    data = {
+        f'station {index}': {
+            'temperature': round(rng.uniform(-30, 45), 1),
+            'conditions': rng.choice(CONDITIONS),
+            'humidity': rng.randint(0, 100)
+        }
+        for index in range(count)
+    }
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(data, handle)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def read_memory(pid):
+    """Return RSS, PSS and private memory in KiB for a process"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup', encoding='utf-8') as handle:
+        for line in handle:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(':')] = int(parts[1])
+    private = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return values.get('Rss', 0), values.get('Pss', 0), private
+
+
+def worker_pids(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children', encoding='utf-8') as handle:
+        return [int(pid) for pid in handle.read().split()]
+
+
+def wait_until_ready(port, timeout):
+    """Poll /health until the server answers"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def measure(data_path, workers, preload, timeout):
+    port = free_port()
+    env = dict(os.environ, WEATHER_DATA_FILE=data_path, GUNICORN_PRELOAD='1' if preload else '0',
+               GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_WORKERS=str(workers))
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(package_dir, 'gunicorn.conf.py'),
+               'weather_api_next.app:app']
+
+    started = time.perf_counter()
+    process = subprocess.Popen(command, env=env, cwd=os.path.dirname(package_dir),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_ready(port, timeout):
+            raise RuntimeError('gunicorn did not become ready in time')
+
+        # Every worker must be up (and loaded) before the numbers mean anything
+        while len(worker_pids(process.pid)) < workers:
+            time.sleep(0.05)
+        for _ in range(workers * 4):
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/v1/weather/stats').read()
+        ready = time.perf_counter() - started
+
+        master = read_memory(process.pid)
+        per_worker = [read_memory(pid) for pid in worker_pids(process.pid)]
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+    return ready, master, per_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', help='existing dataset file (JSON or NDJSON)')
+    parser.add_argument('--locations', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = args.data
+        if not data_path:
+            data_path = os.path.join(tmp, 'weather.json')
+            generate_dataset(data_path, args.locations)
+
+        print(f"{'mode':<10}{'ready (s)':>12}{'master RSS':>14}{'worker RSS':>14}"
+              f"{'worker PSS':>14}{'worker priv':>14}")
+        for preload in (False, True):
+            ready, master, per_worker = measure(data_path, args.workers, preload, args.timeout)
+            rss = sum(item[0] for item in per_worker) / len(per_worker)
+            pss = sum(item[1] for item in per_worker) / len(per_worker)
+            private = sum(item[2] for item in per_worker) / len(per_worker)
+            print(f"{'preload' if preload else 'per-worker':<10}{ready:>12.2f}{master[0]:>11} KiB"
+                  f"{rss:>11.0f} KiB{pss:>11.0f} KiB{private:>11.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
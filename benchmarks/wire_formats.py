@@ -0,0 +1,70 @@
+"""Compare payload size and encode time of the supported wire formats
+
+Usage (from the directory containing the package):
+
+    python -m weather_api_next.benchmarks.wire_formats --locations 10000 --repeat 20
+
+Encodes the full-dataset payload (GET /api/v1/weather) and a single
+record through the same code paths the API uses and prints size and
+best-of-N encode time per format.
+"""
+import argparse
+import time
+
+from flask import json
+
+from weather_api_next import create_app
+from weather_api_next.api import formats
+from weather_api_next.benchmarks.startup_rss import CONDITIONS
+
+
+def build_payload(count):
+    return {
+        f'station {index}': {
+            'temperature': round(-30 + (index * 7.3) % 75, 1),
+            'conditions': CONDITIONS[index % len(CONDITIONS)],
+            'humidity': index % 101
+        }
+        for index in range(count)
+    }
+
+
+def best_time(func, payload, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func(payload)
+        best = min(best, time.perf_counter() - started)
+    return best, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--locations', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    payload = build_payload(args.locations)
+    single = next(iter(payload.values()))
+
+    encoders = [('json', lambda data: json.dumps(data).encode())]
+    if formats.msgpack is not None:
+        encoders.append(('msgpack', formats.encode_msgpack))
+    if formats.cbor2 is not None:
+        encoders.append(('cbor', formats.encode_cbor))
+
+    with app.app_context():
+        print(f"{'format':<10}{'dataset bytes':>15}{'encode ms':>12}{'record bytes':>14}{'encode us':>12}")
+        for name, encode in encoders:
+            elapsed, size = best_time(encode, payload, args.repeat)
+            record_elapsed, record_size = best_time(encode, single, args.repeat * 100)
+            print(f'{name:<10}{size:>15}{elapsed * 1e3:>12.2f}{record_size:>14}{record_elapsed * 1e6:>12.2f}')
+
+        if formats.pyarrow is not None:
+            elapsed, size = best_time(formats.encode_arrow, payload, args.repeat)
+            print(f"{'arrow':<10}{size:>15}{elapsed * 1e3:>12.2f}{'-':>14}{'-':>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""Bulk loading of CSV and NDJSON files straight into the store
+
+The store lives in each server process, so loading happens at startup:
+preload() uses bulk_load() when WEATHER_DATA_FILE is a .csv, .ndjson or
+.jsonl file, in the gunicorn master before workers fork:
+
+    WEATHER_DATA_FILE=stations.csv gunicorn -c weather_api_next/gunicorn.conf.py weather_api_next.app:app
+
+Files are split into chunks of lines that a process pool parses and
+validates; the valid records are then added to the store in a single
+update, so listeners such as the extremes index rebuild once.
+"""
+import csv
+import gc
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from weather_api_next.preload import intern_record
+
+NUMERIC_FIELDS = ('temperature', 'humidity')
+
+
+def file_format(path):
+    """'csv' or 'ndjson' from the file extension"""
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    raise ValueError(f'Unsupported file type: {path} (expected .csv, .ndjson or .jsonl)')
+
+
+def read_chunks(path, chunk_size=50000):
+    """Yield (path, format, header, first line number, lines) work items for a file
+
+    CSV records must not span lines, which keeps chunk boundaries simple.
+    """
+    fmt = file_format(path)
+    with open(path, encoding='utf-8', newline='') as handle:
+        header = next(csv.reader([handle.readline()])) if fmt == 'csv' else None
+        number = 2 if fmt == 'csv' else 1
+        while True:
+            lines = list(islice(handle, chunk_size))
+            if not lines:
+                return
+            yield path, fmt, header, number, lines
+            number += len(lines)
+
+
+def _number(value):
+    """Numeric CSV cell, left as text for validation to reject if it is not one"""
+    for kind in (int, float):
+        try:
+            return kind(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_rows(fmt, header, lines):
+    """Yield one parsed row (a dict, or None for blank lines) per line"""
+    if fmt == 'ndjson':
+        for line in lines:
+            try:
+                yield json.loads(line) if line.strip() else None
+            except ValueError as exc:
+                yield exc
+        return
+
+    for row in csv.reader(lines):
+        if not row:
+            yield None
+            continue
+        data = dict(zip(header, row))
+        for field in NUMERIC_FIELDS:
+            if data.get(field):
+                data[field] = _number(data[field])
+        yield data
+
+
+def parse_chunk(work):
+    """Parse and validate a chunk of lines in a worker process
+
+    Returns the valid records, the number of rows read and a list of
+    (path, line number, message) errors.
+    """
+    from weather_api_next.api.routes import validate_location_name, validate_weather_data
+
+    path, fmt, header, number, lines = work
+    records = {}
+    errors = []
+    rows = 0
+    for offset, data in enumerate(parse_rows(fmt, header, lines)):
+        if data is None:
+            continue
+        rows += 1
+        if isinstance(data, ValueError):
+            errors.append((path, number + offset, str(data)))
+            continue
+        if not isinstance(data, dict) or not isinstance(data.get('location'), str):
+            errors.append((path, number + offset, 'Location is required'))
+            continue
+
+        location = data.pop('location').strip().lower()
+        valid, message = validate_location_name(location)
+        if valid:
+            valid, message = validate_weather_data(data)
+        if not valid:
+            errors.append((path, number + offset, message))
+            continue
+        records[location] = data
+    return records, rows, errors
+
+
+def parse_parallel(work, workers):
+    """Parse work items in a process pool, yielding results in input order
+
+    Only a few chunks per worker are in flight, so files are read at the
+    pace they can be parsed rather than all at once.
+    """
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for item in work:
+            pending.append(executor.submit(parse_chunk, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def bulk_load(paths, workers=None, chunk_size=50000, replace=False, store=None):
+    """Load files into the store and return a summary of the run"""
+    if store is None:
+        from weather_api_next.api.routes import weather_data as store
+
+    for path in paths:
+        file_format(path)
+
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    work = (item for path in paths for item in read_chunks(path, chunk_size))
+    results = map(parse_chunk, work) if workers == 1 else parse_parallel(work, workers)
+
+    # Later rows for the same location replace earlier ones
+    records = {}
+    errors = []
+    rows = 0
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for chunk_records, chunk_rows, chunk_errors in results:
+            rows += chunk_rows
+            for location, data in chunk_records.items():
+                records[sys.intern(location)] = intern_record(data)
+            errors.extend(chunk_errors)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    if replace:
+        store.clear()
+    store.update(records)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'rows': rows,
+        'loaded': len(records),
+        'rejected': len(errors),
+        'errors': errors,
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed if elapsed else None
+    }
@@ -0,0 +1,117 @@
+"""Sampled capture of incoming API traffic to a JSONL file
+
+Each captured request becomes one line holding what replay.py needs to
+send it again: method, path, query string, body, content negotiation
+headers and the original timing. Authorization headers are never stored.
+"""
+import base64
+import io
+import json
+import random
+import threading
+import time
+
+from werkzeug.exceptions import HTTPException
+
+# Internal traffic that would only add noise to a replayed workload
+EXCLUDED_PREFIXES = ('/api/v1/replication', '/api/v1/admin')
+
+
+class TrafficCapture:
+    """WSGI middleware writing a sample of requests to a JSONL file"""
+
+    def __init__(self, path, sample=0.01, max_body=65536, rng=None):
+        self.app = None
+        self.wsgi_app = None
+        self.sample = sample
+        self.max_body = max_body
+        self.random = rng or random.Random()
+        self.captured = 0
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a capture from Flask configuration values"""
+        return cls(config['WEATHER_CAPTURE_FILE'], sample=config.get('WEATHER_CAPTURE_SAMPLE', 0.01))
+
+    def init_app(self, app):
+        """Install the middleware in front of a Flask application"""
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        app.wsgi_app = self
+        app.extensions['weather_capture'] = self
+        return self
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if path.startswith(EXCLUDED_PREFIXES) or self.random.random() >= self.sample:
+            return self.wsgi_app(environ, start_response)
+
+        body = self._read_body(environ)
+        status = []
+
+        def capture_status(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(' ', 1)[0]))
+            return start_response(status_line, headers, exc_info)
+
+        ts = time.time()
+        started = time.perf_counter()
+        response = self.wsgi_app(environ, capture_status)
+        duration = time.perf_counter() - started
+
+        self.write({
+            'ts': ts,
+            'method': environ.get('REQUEST_METHOD', 'GET'),
+            'path': path,
+            'rule': self._rule(environ),
+            'query': environ.get('QUERY_STRING', ''),
+            'content_type': environ.get('CONTENT_TYPE') or None,
+            'accept': environ.get('HTTP_ACCEPT') or None,
+            **self._encode_body(body),
+            'status': status[0] if status else None,
+            'duration_ms': round(duration * 1000, 3)
+        })
+        return response
+
+    def write(self, entry):
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.captured += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def _read_body(self, environ):
+        """Read the request body and put an equivalent stream back"""
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if not length:
+            return b''
+
+        body = environ['wsgi.input'].read(length)
+        environ['wsgi.input'] = io.BytesIO(body)
+        return body
+
+    def _encode_body(self, body):
+        if not body:
+            return {'body': None}
+        if len(body) > self.max_body:
+            return {'body': None, 'body_truncated': len(body)}
+        try:
+            return {'body': body.decode('utf-8')}
+        except UnicodeDecodeError:
+            return {'body': base64.b64encode(body).decode('ascii'), 'body_encoding': 'base64'}
+
+    def _rule(self, environ):
+        """URL rule the request matched, used to group latencies on replay"""
+        try:
+            rule, _ = self.app.url_map.bind_to_environ(environ).match(return_rule=True)
+            return rule.rule
+        except HTTPException:
+            return None
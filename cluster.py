@@ -0,0 +1,94 @@
+"""Run several API nodes as local processes for multi-node testing
+
+Usage (from the directory containing the package):
+
+    python -m weather_api_next.cluster --shards 3 --port 5000
+
+starts three empty shard nodes on free ports plus a router on port 5000.
+Tests use start_node() directly. Each node is configured through the
+same environment variables as a normal deployment.
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+
+
+def serve(port, clear):
+    """Serve the app from this process, announcing the bound port on stdout"""
+    from werkzeug.serving import make_server
+    from weather_api_next import create_app
+    from weather_api_next.api.routes import weather_data
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    # Cleared before the app exists so replication and expiry never see it
+    if clear:
+        weather_data.clear()
+    app = create_app(os.environ.get('FLASK_CONFIG', 'production'))
+
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    print(server.server_port, flush=True)
+    server.serve_forever()
+
+
+class LocalNode:
+    """An API node running in its own process"""
+
+    def __init__(self, env=None, clear=True, port=0):
+        command = [sys.executable, '-m', 'weather_api_next.cluster', 'serve', '--port', str(port)]
+        if not clear:
+            command.append('--keep-data')
+        self.process = subprocess.Popen(command, env={**os.environ, **(env or {})},
+                                        stdout=subprocess.PIPE, text=True)
+        line = self.process.stdout.readline()
+        if not line:
+            raise RuntimeError('Node process exited before it started serving')
+        self.port = int(line)
+        self.url = f'http://127.0.0.1:{self.port}'
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait(timeout=10)
+        self.process.stdout.close()
+
+
+def start_node(env=None, clear=True, port=0):
+    """Start a node process and return it once it is accepting requests"""
+    return LocalNode(env, clear, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local sharded cluster')
+    subparsers = parser.add_subparsers(dest='command')
+    serve_parser = subparsers.add_parser('serve', help='serve a single node')
+    serve_parser.add_argument('--port', type=int, default=0)
+    serve_parser.add_argument('--keep-data', action='store_true')
+    parser.add_argument('--shards', type=int, default=3)
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.port, clear=not args.keep_data)
+        return
+
+    shards = [start_node() for _ in range(args.shards)]
+    for shard in shards:
+        print(f'shard  {shard.url}')
+
+    router = start_node({'WEATHER_SHARDS': ','.join(shard.url for shard in shards)},
+                        clear=False, port=args.port)
+    print(f'router {router.url}')
+
+    try:
+        router.process.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for node in [router, *shards]:
+            node.stop()
+
+
+if __name__ == '__main__':
+    main()
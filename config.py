@@ -6,6 +6,68 @@ class BaseConfig:
     TESTING = False
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-key-please-change')
 
+    # Dataset loaded at startup and whether to warm routes before forking
+    WEATHER_DATA_FILE = os.environ.get('WEATHER_DATA_FILE')
+    WEATHER_PRELOAD = os.environ.get('WEATHER_PRELOAD', '').lower() in ('1', 'true', 'yes')
+    # Parser processes for CSV/NDJSON data files (default: CPU count)
+    WEATHER_LOAD_WORKERS = int(os.environ['WEATHER_LOAD_WORKERS']) if os.environ.get('WEATHER_LOAD_WORKERS') else None
+
+    # Default seconds before a reading expires; unset keeps readings forever
+    WEATHER_RECORD_TTL = float(os.environ['WEATHER_RECORD_TTL']) if os.environ.get('WEATHER_RECORD_TTL') else None
+
+    # Comma-separated shard base URLs; when set the app runs as a router
+    WEATHER_SHARDS = os.environ.get('WEATHER_SHARDS')
+    WEATHER_SHARD_REPLICAS = int(os.environ.get('WEATHER_SHARD_REPLICAS', 100))
+    WEATHER_SHARD_TIMEOUT = float(os.environ.get('WEATHER_SHARD_TIMEOUT', 5))
+
+    # Replication: 'leader', 'follower' or unset for a standalone instance
+    WEATHER_REPLICATION_ROLE = os.environ.get('WEATHER_REPLICATION_ROLE')
+    WEATHER_LEADER_URL = os.environ.get('WEATHER_LEADER_URL')
+    WEATHER_REPLICATION_LOG_SIZE = int(os.environ.get('WEATHER_REPLICATION_LOG_SIZE', 100000))
+    WEATHER_REPLICATION_POLL_WAIT = float(os.environ.get('WEATHER_REPLICATION_POLL_WAIT', 10))
+
+    # Largest number of locations accepted by the batch endpoint
+    WEATHER_BATCH_MAX_LOCATIONS = int(os.environ.get('WEATHER_BATCH_MAX_LOCATIONS', 500))
+
+    # Number of derived-metrics query results kept per data generation (0 disables)
+    WEATHER_DERIVED_CACHE_SIZE = int(os.environ.get('WEATHER_DERIVED_CACHE_SIZE', 32))
+
+    # Keep temperature and humidity sorted for top-K queries (otherwise scanned with a heap)
+    WEATHER_EXTREMES_INDEX = os.environ.get('WEATHER_EXTREMES_INDEX', 'true').lower() == 'true'
+
+    # Seconds to coalesce PUT updates before indexes and followers hear of them (off when unset)
+    WEATHER_WRITE_BEHIND_WINDOW = float(os.environ['WEATHER_WRITE_BEHIND_WINDOW']) if os.environ.get('WEATHER_WRITE_BEHIND_WINDOW') else None
+    WEATHER_WRITE_BEHIND_MAX_BATCH = int(os.environ.get('WEATHER_WRITE_BEHIND_MAX_BATCH', 1000))
+
+    # Background query jobs: worker processes, seconds results are kept, cached queries,
+    # and queued or running jobs allowed before submissions get a 429
+    WEATHER_JOB_WORKERS = int(os.environ.get('WEATHER_JOB_WORKERS', 2))
+    WEATHER_JOB_RETENTION = float(os.environ.get('WEATHER_JOB_RETENTION', 300))
+    WEATHER_JOB_CACHE_SIZE = int(os.environ.get('WEATHER_JOB_CACHE_SIZE', 32))
+    WEATHER_JOB_MAX_PENDING = int(os.environ.get('WEATHER_JOB_MAX_PENDING', 16))
+
+    # Serve GET /api/v1/weather/<location> from a WSGI shortcut instead of Flask
+    WEATHER_FAST_PATH = os.environ.get('WEATHER_FAST_PATH', 'false').lower() == 'true'
+
+    # Append a sample of requests to this JSONL file for later replay (off when unset)
+    WEATHER_CAPTURE_FILE = os.environ.get('WEATHER_CAPTURE_FILE')
+    WEATHER_CAPTURE_SAMPLE = float(os.environ.get('WEATHER_CAPTURE_SAMPLE', 0.01))
+
+    # Token required by /api/v1/admin endpoints; admin access is off when unset
+    WEATHER_ADMIN_TOKEN = os.environ.get('WEATHER_ADMIN_TOKEN')
+    # Records sampled by the memory report on large stores
+    WEATHER_MEMORY_SAMPLE = int(os.environ.get('WEATHER_MEMORY_SAMPLE', 1000))
+    # Frames kept by tracemalloc; 0 leaves allocation tracing off
+    WEATHER_TRACEMALLOC = int(os.environ.get('WEATHER_TRACEMALLOC', 0))
+
+    # Upstream weather provider, disabled unless a URL is configured
+    WEATHER_PROVIDER_URL = os.environ.get('WEATHER_PROVIDER_URL')
+    WEATHER_PROVIDER_TTL = int(os.environ.get('WEATHER_PROVIDER_TTL', 300))
+    WEATHER_PROVIDER_STALE_TTL = int(os.environ.get('WEATHER_PROVIDER_STALE_TTL', 3600))
+    WEATHER_PROVIDER_MISSING_TTL = int(os.environ.get('WEATHER_PROVIDER_MISSING_TTL', 60))
+    WEATHER_PROVIDER_TIMEOUT = float(os.environ.get('WEATHER_PROVIDER_TIMEOUT', 5))
+    WEATHER_PROVIDER_POOL_SIZE = int(os.environ.get('WEATHER_PROVIDER_POOL_SIZE', 10))
+
 class DevelopmentConfig(BaseConfig):
     """Development configuration"""
     DEBUG = True
@@ -13,6 +75,16 @@ class DevelopmentConfig(BaseConfig):
 class TestingConfig(BaseConfig):
     """Testing configuration"""
     TESTING = True
+    WEATHER_PROVIDER_URL = None
+    WEATHER_DATA_FILE = None
+    WEATHER_PRELOAD = False
+    WEATHER_RECORD_TTL = None
+    WEATHER_SHARDS = None
+    WEATHER_REPLICATION_ROLE = None
+    WEATHER_ADMIN_TOKEN = None
+    WEATHER_TRACEMALLOC = 0
+    WEATHER_CAPTURE_FILE = None
+    WEATHER_WRITE_BEHIND_WINDOW = None
 
 class ProductionConfig(BaseConfig):
     """Production configuration"""
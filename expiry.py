@@ -0,0 +1,102 @@
+"""TTL-based expiry of stale weather readings"""
+import heapq
+import threading
+import time
+
+
+class ExpiryScheduler:
+    """Drop records whose time-to-live has passed
+
+    Deadlines are kept in a min-heap, so a sweep only looks at entries that
+    are actually due: expiring k records costs O(k log N) rather than a scan
+    of the whole store. Every write to a location resets its deadline to the
+    default TTL unless a per-record TTL is given with schedule().
+    """
+
+    def __init__(self, store=None, default_ttl=None, clock=time.monotonic):
+        if store is None:
+            from weather_api_next.api.routes import weather_data as store
+        self.store = store
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self.expired_total = 0
+        self._lock = threading.RLock()
+        self._heap = []
+        self._deadlines = {}
+
+        if default_ttl:
+            for location in list(store):
+                self.schedule(location, default_ttl)
+        store.subscribe(self._on_change)
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a scheduler from Flask configuration values"""
+        return cls(default_ttl=config.get('WEATHER_RECORD_TTL'))
+
+    def init_app(self, app):
+        """Register the scheduler on a Flask application"""
+        app.extensions['weather_expiry'] = self
+        return self
+
+    def schedule(self, location, ttl):
+        """Expire a location ``ttl`` seconds from now (None cancels expiry)"""
+        with self._lock:
+            if not ttl:
+                self._deadlines.pop(location, None)
+                return
+
+            deadline = self.clock() + ttl
+            self._deadlines[location] = deadline
+            heapq.heappush(self._heap, (deadline, location))
+
+            # Rescheduling leaves superseded entries behind; rebuild when they dominate
+            if len(self._heap) > 2 * len(self._deadlines) + 64:
+                self._heap = [(when, name) for name, when in self._deadlines.items()]
+                heapq.heapify(self._heap)
+
+    def deadline(self, location):
+        """Monotonic time at which a location expires, or None"""
+        return self._deadlines.get(location)
+
+    def sweep(self):
+        """Remove every record whose deadline has passed"""
+        heap = self._heap
+        now = self.clock()
+        if not heap or heap[0][0] > now:
+            return 0
+
+        expired = 0
+        # Store lock first, as writers hold it while our listener runs
+        with self.store.lock, self._lock:
+            while heap and heap[0][0] <= now:
+                deadline, location = heapq.heappop(heap)
+                if self._deadlines.get(location) != deadline:
+                    continue
+                del self._deadlines[location]
+                if self.store.pop(location, None) is not None:
+                    expired += 1
+            self.expired_total += expired
+        return expired
+
+    def stats(self):
+        """Counters describing the scheduler"""
+        return {
+            'default_ttl': self.default_ttl,
+            'tracked': len(self._deadlines),
+            'heap_size': len(self._heap),
+            'expired_total': self.expired_total
+        }
+
+    def _on_change(self, event, location, record):
+        with self._lock:
+            if event == 'set':
+                self.schedule(location, self.default_ttl)
+            elif event == 'delete':
+                self._deadlines.pop(location, None)
+            elif event == 'bulk':
+                for name in record:
+                    self.schedule(name, self.default_ttl)
+            elif event == 'clear':
+                self._deadlines.clear()
+                self._heap.clear()
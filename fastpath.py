@@ -0,0 +1,92 @@
+"""WSGI shortcut for GET /api/v1/weather/<location>
+
+Single-location reads dominate traffic, and for them Flask routing,
+request objects and jsonify cost far more than the dict lookup. This
+middleware answers those reads straight from the store, with a
+prebuilt 404 body and a plain json.dumps of the record, producing the
+same status, headers and bytes as the Flask view. Anything it cannot
+answer identically (other routes and methods, non-JSON Accept headers,
+an upstream provider, debug output) is passed on to Flask unchanged.
+"""
+import json
+
+PREFIX = '/api/v1/weather/'
+
+# Accept headers for which the view would pick JSON
+JSON_ACCEPTS = frozenset({None, '', '*/*', 'application/json'})
+
+
+class FastPath:
+    """Serve hot single-location reads without entering Flask"""
+
+    def __init__(self, store=None):
+        if store is None:
+            from weather_api_next.api.routes import weather_data as store
+        self.store = store
+        self.app = None
+        self.wsgi_app = None
+        self.reserved = frozenset()
+        self.served = 0
+
+    def init_app(self, app):
+        """Install in front of Flask, behind traffic capture if that is enabled"""
+        self.app = app
+        # Static routes such as /weather/stats take precedence over <location>
+        self.reserved = frozenset(rule.rule[len(PREFIX):] for rule in app.url_map.iter_rules()
+                                  if rule.rule.startswith(PREFIX) and '<' not in rule.rule)
+        self.not_found = self._encode({'error': 'Location not found'})
+
+        holder = app.extensions.get('weather_capture', app)
+        self.wsgi_app = holder.wsgi_app
+        holder.wsgi_app = self
+        app.extensions['weather_fast_path'] = self
+        return self
+
+    def _encode(self, payload):
+        # Matches jsonify() with the default compact settings
+        config = self.app.config
+        return (json.dumps(payload, sort_keys=config['JSON_SORT_KEYS'],
+                           ensure_ascii=config['JSON_AS_ASCII'],
+                           separators=(',', ':')) + '\n').encode('utf-8')
+
+    def _eligible(self, environ):
+        return (environ.get('REQUEST_METHOD') == 'GET'
+                and environ.get('HTTP_ACCEPT') in JSON_ACCEPTS
+                and not self.app.debug
+                and not self.app.config['JSONIFY_PRETTYPRINT_REGULAR']
+                and 'weather_provider' not in self.app.extensions)
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(PREFIX) or not self._eligible(environ):
+            return self.wsgi_app(environ, start_response)
+
+        location = path[len(PREFIX):]
+        if not location or '/' in location or not location.isascii() or location in self.reserved:
+            return self.wsgi_app(environ, start_response)
+
+        # Same per-request work as the before_request hooks it bypasses: a
+        # forked follower worker starts replicating, and stale records expire
+        replication = self.app.extensions.get('weather_replication')
+        if hasattr(replication, 'ensure_running'):
+            replication.ensure_running()
+        expiry = self.app.extensions.get('weather_expiry')
+        if expiry is not None:
+            expiry.sweep()
+
+        record = self.store.get(location.lower())
+        if record is None:
+            status, body = '404 NOT FOUND', self.not_found
+            headers = [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))]
+        else:
+            try:
+                status, body = '200 OK', self._encode(record)
+            except (TypeError, ValueError):
+                return self.wsgi_app(environ, start_response)
+            # respond() marks negotiated responses with Vary: Accept
+            headers = [('Content-Type', 'application/json'), ('Content-Length', str(len(body))),
+                       ('Vary', 'Accept')]
+
+        start_response(status, headers)
+        self.served += 1
+        return [body]
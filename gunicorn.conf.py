@@ -0,0 +1,16 @@
+"""Gunicorn settings for fork-friendly preloaded startup
+
+Run from the directory containing the package, for example:
+
+    WEATHER_DATA_FILE=stations.json gunicorn -c weather_api_next/gunicorn.conf.py weather_api_next.app:app
+
+The app (and its dataset) is loaded once in the master. Workers are
+forked afterwards and share those pages copy-on-write.
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+raw_env = [f"WEATHER_PRELOAD={'1' if preload_app else '0'}"]
@@ -0,0 +1,287 @@
+"""Background jobs for expensive queries
+
+Searches and aggregations over the whole store can take seconds on large
+datasets. Submitted as jobs, they run in a process pool over a snapshot
+of the store taken at submission, so request workers return at once and
+the result reflects a single consistent state. Results are cached per
+store generation: resubmitting the same query before any write returns
+the existing job.
+"""
+import atexit
+import json
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from flask import Blueprint, current_app, jsonify, make_response, request
+
+from weather_api_next.api.formats import get_request_data, has_supported_body, respond
+
+jobs_bp = Blueprint('jobs', __name__)
+
+JOB_TYPES = ('search', 'aggregate')
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class JobLimitError(Exception):
+    """Raised when too many jobs are already queued or running"""
+
+
+def run_search(records, filters):
+    """Search job body, run in a worker process"""
+    from weather_api_next.api.routes import matches_filters
+    return {location: data for location, data in records.items() if matches_filters(data, filters)}
+
+
+def run_aggregate(records, options, filters):
+    """Aggregation job body, run in a worker process"""
+    from weather_api_next.api.aggregation import aggregate
+    from weather_api_next.api.routes import matches_filters
+    return aggregate(records.values(), predicate=lambda data: matches_filters(data, filters), **options)
+
+
+def parse_job(kind, params):
+    """Validate a job request, returning (function, args) or None and a message"""
+    from weather_api_next.api.routes import parse_aggregate_options, parse_search_filters
+
+    if kind not in JOB_TYPES:
+        return None, f"type must be one of: {', '.join(JOB_TYPES)}"
+    if not isinstance(params, dict):
+        return None, 'params must be an object'
+
+    # Same parsing as the query string of the equivalent endpoint
+    args = {name: str(value) for name, value in params.items() if value is not None}
+    if kind == 'search':
+        filters, message = parse_search_filters(args)
+        if filters is None:
+            return None, message
+        return (run_search, (filters,)), ""
+
+    options, filters, message = parse_aggregate_options(args)
+    if options is None:
+        return None, message
+    return (run_aggregate, (options, filters)), ""
+
+
+class Job:
+    """A submitted query and its future"""
+
+    def __init__(self, kind, params, generation, future):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.generation = generation
+        self.future = future
+        self.submitted = time.time()
+        self.finished = None
+        self.cancelled = False
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        self.finished = time.time()
+
+    @property
+    def status(self):
+        if self.cancelled or self.future.cancelled():
+            return CANCELLED
+        if not self.future.done():
+            return RUNNING if self.future.running() else QUEUED
+        return FAILED if self.future.exception() is not None else DONE
+
+    def to_dict(self, include_result=True):
+        status = self.status
+        job = {
+            'id': self.id,
+            'type': self.kind,
+            'params': self.params,
+            'status': status,
+            'generation': self.generation,
+            'submitted': self.submitted,
+            'finished': self.finished
+        }
+        if include_result and status == DONE:
+            job['result'] = self.future.result()
+        elif status == FAILED:
+            job['error'] = str(self.future.exception())
+        return job
+
+
+class JobManager:
+    """Run queries in a process pool and keep their results for a while"""
+
+    def __init__(self, store=None, workers=2, retention=300, cache_size=32, max_pending=16):
+        if store is None:
+            from weather_api_next.api.routes import weather_data as store
+        self.store = store
+        self.workers = workers
+        self.retention = retention
+        self.cache_size = cache_size
+        self.max_pending = max_pending
+        self.cache_hits = 0
+        self._jobs = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a job manager from Flask configuration values"""
+        return cls(workers=config.get('WEATHER_JOB_WORKERS', 2),
+                   retention=config.get('WEATHER_JOB_RETENTION', 300),
+                   cache_size=config.get('WEATHER_JOB_CACHE_SIZE', 32),
+                   max_pending=config.get('WEATHER_JOB_MAX_PENDING', 16))
+
+    def init_app(self, app):
+        """Register the manager and the /api/v1/jobs routes on an application"""
+        app.extensions['weather_jobs'] = self
+        app.register_blueprint(jobs_bp, url_prefix='/api/v1/jobs')
+        return self
+
+    @property
+    def executor(self):
+        # Started on first use, with fresh interpreters since the server is threaded
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            atexit.register(self.close)
+        return self._executor
+
+    def submit(self, kind, params, function, args):
+        """Start a job, or return the cached one for the same query and data
+
+        Raises JobLimitError when ``max_pending`` jobs are already queued or
+        running.
+        """
+        query = json.dumps(params, sort_keys=True)
+        with self._lock:
+            self._expire()
+            job = self._cached((self.store.generation, kind, query))
+            if job is not None:
+                return job
+            self._check_pending()
+
+        # Writers (in-place PUTs included) hold the store lock, so under it
+        # the copy and its generation describe one state. It is O(N), so it
+        # happens outside the manager lock.
+        with self.store.lock:
+            generation = self.store.generation
+            snapshot = {location: dict(data) for location, data in self.store.items()}
+        key = (generation, kind, query)
+
+        with self._lock:
+            # Another request may have submitted the same query meanwhile
+            job = self._cached(key)
+            if job is not None:
+                return job
+            self._check_pending()
+            job = Job(kind, params, generation, self.executor.submit(function, snapshot, *args))
+            self._jobs[job.id] = job
+            self._cache[key] = job.id
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return job
+
+    def _cached(self, key):
+        job = self._jobs.get(self._cache.get(key))
+        if job is None or job.status in (FAILED, CANCELLED):
+            return None
+        self._cache.move_to_end(key)
+        self.cache_hits += 1
+        return job
+
+    def _check_pending(self):
+        pending = sum(1 for job in self._jobs.values() if job.finished is None)
+        if pending >= self.max_pending:
+            raise JobLimitError(f'Too many jobs in progress (limit {self.max_pending})')
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job, timeout):
+        """Block until a job finishes or ``timeout`` seconds pass"""
+        wait([job.future], timeout=timeout)
+
+    def cancel(self, job_id):
+        """Cancel a job; a running one finishes in its worker but is discarded"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if not job.future.done():
+                job.cancelled = True
+                job.future.cancel()
+            return job
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _expire(self):
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished is not None and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+
+def get_jobs():
+    return current_app.extensions['weather_jobs']
+
+
+@jobs_bp.route('', methods=['POST'])
+def submit_job():
+    """Submit a search or aggregation to run in the background"""
+    if not has_supported_body():
+        return jsonify({'error': 'Request must be JSON'}), 400
+
+    data = get_request_data()
+    kind = data.get('type')
+    params = data.get('params') or {}
+    parsed, message = parse_job(kind, params)
+    if parsed is None:
+        return jsonify({'error': message}), 400
+
+    function, args = parsed
+    try:
+        job = get_jobs().submit(kind, params, function, args)
+    except JobLimitError as exc:
+        return jsonify({'error': str(exc)}), 429
+    response = make_response(respond(job.to_dict(include_result=False), 202))
+    response.headers['Location'] = f'{request.path}/{job.id}'
+    return response
+
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status, and its result once done; ?wait=N long-polls for completion"""
+    manager = get_jobs()
+    job = manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    try:
+        wait = min(float(request.args.get('wait', 0)), 60)
+    except ValueError:
+        return jsonify({'error': 'wait must be a number'}), 400
+
+    if wait > 0 and job.status in (QUEUED, RUNNING):
+        manager.wait(job, wait)
+
+    return respond(job.to_dict())
+
+
+@jobs_bp.route('/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    job = get_jobs().cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return respond(job.to_dict(include_result=False))
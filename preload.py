@@ -0,0 +1,103 @@
+"""Load, index and warm the dataset once before workers fork"""
+import gc
+import json
+import logging
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# Files parsed in parallel by bulkload.bulk_load()
+BULK_SUFFIXES = ('.csv', '.ndjson', '.jsonl')
+
+# Read endpoints requested once so routing and serialization paths are warm
+WARMUP_PATHS = (
+    '/health',
+    '/api/v1/weather',
+    '/api/v1/weather/stats',
+    '/api/v1/weather/search?conditions=warmup',
+    '/api/v1/weather/aggregate?group_by=conditions&histogram=temperature',
+)
+
+
+def load_dataset(path):
+    """Read weather records from a JSON mapping shaped like GET /api/v1/weather
+
+    CSV and NDJSON files go through preload_bulk() instead.
+    """
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def intern_record(data):
+    """Share repeated strings between records to keep pages compact"""
+    return {sys.intern(key): sys.intern(value) if isinstance(value, str) else value
+            for key, value in data.items()}
+
+
+def preload_bulk(app, path, store):
+    """Load a CSV or NDJSON file with the parallel bulk loader"""
+    from weather_api_next.bulkload import bulk_load
+
+    report = bulk_load([path], workers=app.config.get('WEATHER_LOAD_WORKERS'), store=store)
+    for name, number, message in report['errors'][:20]:
+        logger.warning('Skipping %s:%d: %s', name, number, message)
+    if report['rejected'] > 20:
+        logger.warning('Skipped %d more invalid rows', report['rejected'] - 20)
+    # Logged at warning level so the load rate shows with default logging
+    logger.warning('Bulk loaded %d of %d rows from %s at %.0f rows/s', report['loaded'], report['rows'],
+                   path, report['rows_per_second'] or 0)
+    return report['loaded']
+
+
+def preload(app, path=None, warmup=True):
+    """Load the dataset into the store, warm the app and freeze the heap
+
+    Meant to run in the gunicorn master (``preload_app = True``) so that
+    forked workers share the loaded pages copy-on-write. Objects created
+    here are moved to the permanent GC generation so collections in the
+    workers never touch, and therefore never dirty, those pages.
+    """
+    from weather_api_next.api.routes import (
+        validate_location_name, validate_weather_data, weather_data
+    )
+
+    started = time.perf_counter()
+    gc.disable()
+    try:
+        if path and path.endswith(BULK_SUFFIXES):
+            loaded = preload_bulk(app, path, weather_data)
+        else:
+            records = {}
+            if path:
+                for location, data in load_dataset(path).items():
+                    location = location.lower()
+                    valid, message = validate_location_name(location)
+                    if valid:
+                        valid, message = validate_weather_data(data)
+                    if not valid:
+                        logger.warning('Skipping %s: %s', location, message)
+                        continue
+                    records[sys.intern(location)] = intern_record(data)
+
+            # One update, so listeners such as the extremes index rebuild once
+            if records:
+                weather_data.update(records)
+            loaded = len(records)
+
+        if warmup:
+            with app.test_client() as client:
+                for warmup_path in WARMUP_PATHS:
+                    client.get(warmup_path)
+                if weather_data:
+                    client.get(f'/api/v1/weather/{next(iter(weather_data))}')
+    finally:
+        gc.enable()
+
+    gc.collect()
+    gc.freeze()
+
+    elapsed = time.perf_counter() - started
+    logger.info('Preloaded %d locations in %.3fs (%d objects frozen)',
+                loaded, elapsed, gc.get_freeze_count())
+    return loaded
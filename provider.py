@@ -0,0 +1,210 @@
+"""Upstream weather provider client"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+WEATHER_FIELDS = ('temperature', 'conditions', 'humidity')
+
+
+class ProviderError(Exception):
+    """Raised when the upstream provider cannot supply a location"""
+
+
+def create_session(pool_size=10):
+    """Create a requests session backed by a keep-alive connection pool"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class WeatherProvider:
+    """Fill in missing or stale locations from an upstream HTTP source
+
+    Records fetched from upstream are considered fresh for ``ttl`` seconds.
+    After that they are still served for up to ``stale_ttl`` more seconds
+    while a background refresh runs. Concurrent lookups for the same
+    location share a single upstream request. Names that are not valid
+    locations are never looked up, and upstream 404s are remembered for
+    ``missing_ttl`` seconds, so scans over unknown names stay local.
+    """
+
+    # Most unknown names remembered at once; the oldest are dropped first
+    MAX_MISSING = 10000
+
+    def __init__(self, base_url, store=None, ttl=300, stale_ttl=3600, missing_ttl=60,
+                 timeout=5.0, pool_size=10, max_workers=4, session=None):
+        if store is None:
+            from weather_api_next.api.routes import weather_data as store
+        self.base_url = base_url.rstrip('/')
+        self.store = store
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.missing_ttl = missing_ttl
+        self.timeout = timeout
+        self.session = session or create_session(pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='weather-provider')
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._fetched_at = {}
+        # Location -> monotonic time of its last upstream 404, oldest first
+        self._missing = {}
+        # Bumped by every local write; a fetch only stores if it did not change
+        self._versions = {}
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a provider from Flask configuration values"""
+        return cls(
+            config['WEATHER_PROVIDER_URL'],
+            ttl=config.get('WEATHER_PROVIDER_TTL', 300),
+            stale_ttl=config.get('WEATHER_PROVIDER_STALE_TTL', 3600),
+            missing_ttl=config.get('WEATHER_PROVIDER_MISSING_TTL', 60),
+            timeout=config.get('WEATHER_PROVIDER_TIMEOUT', 5.0),
+            pool_size=config.get('WEATHER_PROVIDER_POOL_SIZE', 10),
+        )
+
+    def init_app(self, app):
+        """Register the provider on a Flask application"""
+        app.extensions['weather_provider'] = self
+        return self
+
+    def get(self, location):
+        """Return the record for a location, fetching it upstream if needed
+
+        Returns None when upstream does not know the location. Raises
+        ProviderError when there is nothing to serve and upstream failed.
+        """
+        location = location.lower()
+        record = self.store.get(location)
+        fetched_at = self._fetched_at.get(location)
+
+        if record is not None:
+            # Locations written locally are authoritative and never refreshed
+            if fetched_at is None:
+                return record
+
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                return record
+
+            if age < self.ttl + self.stale_ttl:
+                self.refresh(location)
+                return record
+
+        elif not self._worth_fetching(location):
+            return None
+
+        try:
+            return self.refresh(location).result(timeout=self.timeout * 2)
+        except Exception as exc:
+            if record is not None:
+                logger.warning('Serving stale %s after refresh failure: %s', location, exc)
+                return record
+            raise ProviderError(f'Upstream provider unavailable: {exc}') from exc
+
+    def refresh(self, location):
+        """Start (or join) an upstream fetch and return its future"""
+        location = location.lower()
+        with self._lock:
+            future = self._inflight.get(location)
+            if future is not None:
+                return future
+            future = self._executor.submit(self._fetch, location)
+            self._inflight[location] = future
+
+        # Registered outside the lock: an already finished future runs the
+        # callback immediately in this thread
+        future.add_done_callback(lambda done: self._finish(location, done))
+        return future
+
+    def is_upstream(self, location):
+        """Whether a location's record was last written by this provider"""
+        return location.lower() in self._fetched_at
+
+    def forget(self, location):
+        """Stop treating a location as provider-managed
+
+        Call before writing the location locally: a fetch that is already
+        running will then discard its result instead of replacing the write.
+        """
+        location = location.lower()
+        with self._lock:
+            self._versions[location] = self._versions.get(location, 0) + 1
+            self._fetched_at.pop(location, None)
+            self._missing.pop(location, None)
+
+    def close(self):
+        """Release pooled connections and worker threads"""
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def _finish(self, location, future):
+        with self._lock:
+            if self._inflight.get(location) is future:
+                del self._inflight[location]
+
+    def _worth_fetching(self, location):
+        """Whether a location not in the store should be asked for upstream"""
+        from weather_api_next.api.routes import validate_location_name
+
+        if not validate_location_name(location)[0]:
+            return False
+        missed_at = self._missing.get(location)
+        return missed_at is None or time.monotonic() - missed_at >= self.missing_ttl
+
+    def _remember_missing(self, location):
+        # Called with the lock held; entries are kept in insertion order
+        now = time.monotonic()
+        self._missing.pop(location, None)
+        self._missing[location] = now
+        while self._missing:
+            name, missed_at = next(iter(self._missing.items()))
+            if len(self._missing) <= self.MAX_MISSING and now - missed_at < self.missing_ttl:
+                break
+            del self._missing[name]
+
+    def _fetch(self, location):
+        from weather_api_next.api.routes import validate_weather_data
+
+        with self._lock:
+            version = self._versions.get(location, 0)
+
+        response = self.session.get(f'{self.base_url}/{quote(location)}', timeout=self.timeout)
+        if response.status_code == 404:
+            # Upstream dropped the location, so stop serving our copy of it
+            with self._lock:
+                if self._versions.get(location, 0) != version:
+                    return self.store.get(location)
+                if self._fetched_at.pop(location, None) is not None:
+                    self.store.pop(location, None)
+                self._remember_missing(location)
+            return None
+        response.raise_for_status()
+
+        data = response.json()
+        if not isinstance(data, dict):
+            raise ProviderError(f'Invalid upstream data for {location}')
+
+        valid, message = validate_weather_data(data)
+        if not valid:
+            raise ProviderError(f'Invalid upstream data for {location}: {message}')
+
+        record = {field: data[field] for field in WEATHER_FIELDS}
+        with self._lock:
+            # Written locally while we were fetching: the local record wins
+            if self._versions.get(location, 0) != version:
+                return self.store.get(location)
+            self.store[location] = record
+            self._fetched_at[location] = time.monotonic()
+            self._missing.pop(location, None)
+        return record
@@ -0,0 +1,163 @@
+"""Replay captured traffic against an instance and report latencies
+
+Usage (from the directory containing the package):
+
+    python -m weather_api_next.replay capture.jsonl --target http://127.0.0.1:5000 --speed 2
+
+Requests are sent in capture order, each at its original offset from the
+first request divided by ``--speed`` (0 sends them back to back), so the
+same log always produces the same request sequence and arrival pattern.
+Each latency is measured from the time the request was scheduled, and
+latencies are grouped by the URL rule recorded at capture time.
+"""
+import argparse
+import base64
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from weather_api_next.provider import create_session
+
+
+def load_capture(path):
+    """Read captured requests, oldest first"""
+    with open(path, encoding='utf-8') as handle:
+        entries = [json.loads(line) for line in handle if line.strip()]
+    return sorted(entries, key=lambda entry: entry['ts'])
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of already sorted values"""
+    if not values:
+        return None
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+def summarize(latencies):
+    """Latency distribution in milliseconds"""
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'mean_ms': sum(values) / len(values) if values else None,
+        'p50_ms': percentile(values, 0.50),
+        'p90_ms': percentile(values, 0.90),
+        'p99_ms': percentile(values, 0.99),
+        'max_ms': values[-1] if values else None
+    }
+
+
+def send(session, target, entry, timeout, scheduled=None):
+    """Issue one captured request, returning (status or None, latency in ms)
+
+    Latency is measured from ``scheduled`` (a perf_counter time) when given,
+    so time spent waiting for a free worker counts against the server.
+    """
+    body = entry.get('body')
+    if body is not None:
+        body = base64.b64decode(body) if entry.get('body_encoding') == 'base64' else body.encode('utf-8')
+
+    headers = {name: entry[key] for name, key in (('Content-Type', 'content_type'), ('Accept', 'accept'))
+               if entry.get(key)}
+    url = f"{target}{entry['path']}"
+    if entry.get('query'):
+        url = f"{url}?{entry['query']}"
+
+    started = time.perf_counter() if scheduled is None else scheduled
+    try:
+        response = session.request(entry['method'], url, data=body, headers=headers, timeout=timeout)
+        status = response.status_code
+    except requests.RequestException:
+        status = None
+    return status, (time.perf_counter() - started) * 1000
+
+
+def replay(entries, target, speed=1.0, concurrency=8, timeout=10.0, session=None):
+    """Send captured requests to ``target`` and report latencies per rule
+
+    Requests whose status differs from the captured one are counted as
+    mismatches; transport failures are counted as errors.
+    """
+    target = target.rstrip('/')
+    session = session or create_session(concurrency)
+    groups = {}
+    mismatches = 0
+    errors = 0
+    lock = threading.Lock()
+
+    def run(entry, scheduled):
+        nonlocal mismatches, errors
+        status, latency = send(session, target, entry, timeout, scheduled)
+        key = f"{entry['method']} {entry.get('rule') or entry['path']}"
+        with lock:
+            groups.setdefault(key, []).append(latency)
+            if status is None:
+                errors += 1
+            elif entry.get('status') is not None and status != entry['status']:
+                mismatches += 1
+
+    started = time.perf_counter()
+    if entries:
+        first = entries[0]['ts']
+        with ThreadPoolExecutor(concurrency, thread_name_prefix='weather-replay') as executor:
+            for entry in entries:
+                # Latency counts from when the request was due, not when a
+                # worker got to it, so a backed-up server is not flattered
+                if speed:
+                    scheduled = started + (entry['ts'] - first) / speed
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                else:
+                    scheduled = time.perf_counter()
+                executor.submit(run, entry, scheduled)
+    elapsed = time.perf_counter() - started
+
+    every = [latency for latencies in groups.values() for latency in latencies]
+    return {
+        'requests': len(entries),
+        'seconds': elapsed,
+        'rate': len(entries) / elapsed if elapsed else None,
+        'errors': errors,
+        'status_mismatches': mismatches,
+        'overall': summarize(every),
+        'by_rule': {key: summarize(latencies) for key, latencies in sorted(groups.items())}
+    }
+
+
+def format_report(report):
+    """Plain-text latency table"""
+    lines = [f"{report['requests']} requests in {report['seconds']:.2f}s "
+             f"({report['rate'] or 0:.0f}/s), {report['errors']} errors, "
+             f"{report['status_mismatches']} status mismatches",
+             f"{'endpoint':<45}{'count':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"]
+    rows = [*report['by_rule'].items(), ('all', report['overall'])]
+    for key, stats in rows:
+        if not stats['count']:
+            continue
+        lines.append(f"{key:<45}{stats['count']:>8}{stats['p50_ms']:>9.2f}{stats['p90_ms']:>9.2f}"
+                     f"{stats['p99_ms']:>9.2f}{stats['max_ms']:>9.2f}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('capture', help='JSONL file written by WEATHER_CAPTURE_FILE')
+    parser.add_argument('--target', default='http://127.0.0.1:5000')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='rate multiplier; 0 sends requests as fast as possible')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    report = replay(load_capture(args.capture), args.target, speed=args.speed,
+                    concurrency=args.concurrency, timeout=args.timeout)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == '__main__':
+    main()
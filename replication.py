@@ -0,0 +1,319 @@
+"""Leader-follower replication of the weather store
+
+The leader records every store mutation in an ordered, bounded log.
+Followers bootstrap from a snapshot tagged with a log position, then
+long-poll the log for entries after that position and apply them in
+order. Entries carry whole records, so applying one twice is harmless.
+
+Every leader process starts a new epoch. Snapshots and log reads carry
+it, so a follower whose leader restarted (and whose positions therefore
+mean a different history) loads a fresh snapshot instead of applying
+entries at the wrong offsets.
+"""
+import copy
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+import requests
+from flask import Blueprint, current_app, jsonify, request
+
+from weather_api_next.provider import create_session
+
+logger = logging.getLogger(__name__)
+
+replication_bp = Blueprint('replication', __name__)
+
+LEADER = 'leader'
+FOLLOWER = 'follower'
+
+# API endpoints that change data and therefore only run on the leader
+WRITE_ENDPOINTS = ('api.create_weather', 'api.update_weather', 'api.delete_weather')
+
+
+class LogTruncated(Exception):
+    """Raised when a follower asks for entries the log no longer holds"""
+
+
+class MutationLog:
+    """Bounded, ordered log of store mutations"""
+
+    def __init__(self, store=None, max_entries=100000):
+        if store is None:
+            from weather_api_next.api.routes import weather_data as store
+        self.store = store
+        self.epoch = uuid.uuid4().hex
+        self.position = 0
+        self._entries = deque(maxlen=max_entries)
+        self._changed = threading.Condition()
+        store.subscribe(self._on_change)
+
+    def snapshot(self):
+        """Copy of the store together with the log position it reflects"""
+        # The store lock keeps writes, and so new positions, out meanwhile
+        with self.store.lock, self._changed:
+            return self.position, copy.deepcopy(dict(self.store))
+
+    def since(self, position, limit=1000, wait=0, epoch=None):
+        """Entries after ``position``, waiting up to ``wait`` seconds for new ones
+
+        Raises LogTruncated when the caller's position cannot be continued
+        from this log: it is older than the oldest entry, ahead of the log,
+        or from another ``epoch``.
+        """
+        with self._changed:
+            if epoch is not None and epoch != self.epoch:
+                raise LogTruncated(f'Leader epoch is {self.epoch}, not {epoch}')
+            if position > self.position:
+                raise LogTruncated(f'Position {position} is ahead of the log at {self.position}')
+
+            if wait and position >= self.position:
+                self._changed.wait_for(lambda: self.position > position, timeout=wait)
+
+            first = self._entries[0]['seq'] if self._entries else self.position + 1
+            if position < first - 1:
+                raise LogTruncated(f'Log starts at {first}, position {position} is too old')
+
+            skip = position - first + 1
+            entries = [self._entries[index]
+                       for index in range(skip, min(len(self._entries), skip + limit))]
+            return self.position, entries
+
+    def _on_change(self, event, location, record):
+        # Runs under the store lock, so positions follow the order of writes
+        if record is not None:
+            record = copy.deepcopy(record)
+        with self._changed:
+            self.position += 1
+            self._entries.append({'seq': self.position, 'ts': time.time(), 'event': event,
+                                  'location': location, 'record': record})
+            self._changed.notify_all()
+
+
+def apply_entry(store, entry):
+    """Apply one replicated mutation to a follower's store"""
+    event = entry['event']
+    if event == 'set':
+        store[entry['location']] = entry['record']
+    elif event == 'delete':
+        store.pop(entry['location'], None)
+    elif event == 'bulk':
+        store.update(entry['record'])
+    elif event == 'clear':
+        store.clear()
+
+
+class Follower:
+    """Keep a local store in sync with a leader"""
+
+    def __init__(self, leader_url, store=None, poll_wait=10, batch_size=1000, retry_delay=1.0):
+        if store is None:
+            from weather_api_next.api.routes import weather_data as store
+        self.leader_url = leader_url.rstrip('/')
+        self.store = store
+        self.poll_wait = poll_wait
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.session = create_session(2)
+        self.epoch = None
+        self.position = 0
+        self.leader_position = 0
+        self.last_applied_ts = None
+        self.snapshots_loaded = 0
+        self.connected = False
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='weather-follower', daemon=True)
+        self._thread.start()
+        return self
+
+    def defer_to_workers(self):
+        """Never follow from this process, only from processes forked off it"""
+        self._pid = os.getpid()
+        return self
+
+    def ensure_running(self):
+        """Start following in this process if it has no follower thread yet
+
+        Threads do not survive fork, so with gunicorn's preload_app the
+        thread is started per worker, on its first request, with a fresh
+        session rather than the connections inherited from the master.
+        """
+        if self._pid == os.getpid() or self._stopped.is_set():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                if self._pid is not None:
+                    self.session = create_session(2)
+                self.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def load_snapshot(self):
+        """Replace the local store with the leader's snapshot"""
+        response = self.session.get(f'{self.leader_url}/api/v1/replication/snapshot',
+                                    timeout=self.poll_wait + 30)
+        response.raise_for_status()
+        snapshot = response.json()
+        self.store.clear()
+        self.store.update(snapshot['data'])
+        self.epoch = snapshot['epoch']
+        self.position = self.leader_position = snapshot['position']
+        self.snapshots_loaded += 1
+
+    def poll(self):
+        """Fetch and apply the next batch of log entries
+
+        Returns False when our position cannot be continued from the
+        leader's log (truncated, or a restarted leader) and a new snapshot
+        is needed.
+        """
+        response = self.session.get(
+            f'{self.leader_url}/api/v1/replication/log',
+            params={'since': self.position, 'limit': self.batch_size, 'wait': self.poll_wait,
+                    'epoch': self.epoch},
+            timeout=self.poll_wait + 30
+        )
+        if response.status_code == 410:
+            return False
+        response.raise_for_status()
+
+        payload = response.json()
+        if payload['epoch'] != self.epoch:
+            return False
+        for entry in payload['entries']:
+            apply_entry(self.store, entry)
+            self.position = entry['seq']
+            self.last_applied_ts = entry['ts']
+        self.leader_position = payload['position']
+        return True
+
+    def lag(self):
+        """Replication lag in log entries and (approximate) seconds"""
+        entries = max(self.leader_position - self.position, 0)
+        seconds = 0.0
+        if entries and self.last_applied_ts is not None:
+            seconds = max(time.time() - self.last_applied_ts, 0.0)
+        return entries, seconds
+
+    def _run(self):
+        needs_snapshot = True
+        while not self._stopped.is_set():
+            try:
+                if needs_snapshot:
+                    self.load_snapshot()
+                    needs_snapshot = False
+                needs_snapshot = not self.poll()
+                self.connected = True
+            except (requests.RequestException, ValueError) as exc:
+                self.connected = False
+                logger.warning('Replication from %s failed: %s', self.leader_url, exc)
+                self._stopped.wait(self.retry_delay)
+
+
+def init_replication(app):
+    """Set up the configured replication role on an application"""
+    role = app.config.get('WEATHER_REPLICATION_ROLE')
+    if not role:
+        return
+
+    if role == LEADER:
+        app.extensions['weather_replication'] = MutationLog(
+            max_entries=app.config.get('WEATHER_REPLICATION_LOG_SIZE', 100000))
+    elif role == FOLLOWER:
+        follower = Follower(app.config['WEATHER_LEADER_URL'],
+                            poll_wait=app.config.get('WEATHER_REPLICATION_POLL_WAIT', 10))
+        app.extensions['weather_replication'] = follower
+        # A preloading gunicorn master only forks workers; each starts its own thread
+        if app.config.get('WEATHER_PRELOAD'):
+            follower.defer_to_workers()
+        else:
+            follower.start()
+        app.before_request(start_follower)
+        app.before_request(reject_follower_writes)
+    else:
+        raise ValueError(f'Unknown replication role: {role}')
+
+    app.register_blueprint(replication_bp, url_prefix='/api/v1/replication')
+
+
+def get_replication():
+    return current_app.extensions.get('weather_replication')
+
+
+@replication_bp.route('/status', methods=['GET'])
+def replication_status():
+    """Report the replication role, position and (on followers) lag"""
+    replica = get_replication()
+    if isinstance(replica, Follower):
+        entries, seconds = replica.lag()
+        return jsonify({
+            'role': FOLLOWER,
+            'leader': replica.leader_url,
+            'connected': replica.connected,
+            'epoch': replica.epoch,
+            'position': replica.position,
+            'leader_position': replica.leader_position,
+            'lag_entries': entries,
+            'lag_seconds': seconds,
+            'snapshots_loaded': replica.snapshots_loaded
+        })
+
+    return jsonify({'role': LEADER, 'epoch': replica.epoch, 'position': replica.position})
+
+
+@replication_bp.route('/snapshot', methods=['GET'])
+def replication_snapshot():
+    """Full copy of the leader's store with its log position"""
+    replica = get_replication()
+    if not isinstance(replica, MutationLog):
+        return jsonify({'error': 'Not a replication leader'}), 404
+
+    position, data = replica.snapshot()
+    return jsonify({'epoch': replica.epoch, 'position': position, 'data': data})
+
+
+@replication_bp.route('/log', methods=['GET'])
+def replication_log():
+    """Mutation log entries after a position, long-polling for new ones"""
+    replica = get_replication()
+    if not isinstance(replica, MutationLog):
+        return jsonify({'error': 'Not a replication leader'}), 404
+
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(int(request.args.get('limit', 1000)), 10000)
+        wait = min(float(request.args.get('wait', 0)), 60)
+    except ValueError:
+        return jsonify({'error': 'since, limit and wait must be numbers'}), 400
+
+    try:
+        position, entries = replica.since(since, limit=limit, wait=wait,
+                                          epoch=request.args.get('epoch'))
+    except LogTruncated as exc:
+        return jsonify({'error': str(exc), 'epoch': replica.epoch}), 410
+
+    return jsonify({'epoch': replica.epoch, 'position': position, 'entries': entries})
+
+
+def start_follower():
+    """Before-request hook: make sure this process is following the leader"""
+    get_replication().ensure_running()
+
+
+def reject_follower_writes():
+    """Before-request hook: followers are read-only"""
+    replica = get_replication()
+    if isinstance(replica, Follower) and request.endpoint in WRITE_ENDPOINTS:
+        return jsonify({'error': 'Writes must be sent to the leader',
+                        'leader': replica.leader_url}), 403
+    return None
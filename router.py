@@ -0,0 +1,321 @@
+"""Routing front end for a hash-partitioned (sharded) deployment
+
+In router mode the app serves the same /api/v1 routes, but holds no data
+itself. Single-location calls are forwarded to the shard that owns the
+location; listings, search, statistics, derived metrics and expiry
+counters are fanned out to every shard in parallel and the partial
+results merged.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from flask import Blueprint, Response, current_app, jsonify, request
+
+from weather_api_next.api import APIError, handle_api_error
+from weather_api_next.api.formats import JSON, get_request_data, has_supported_body, respond
+from weather_api_next.api.routes import parse_batch_locations
+from weather_api_next.provider import create_session
+from weather_api_next.sharding import HashRing
+
+router_bp = Blueprint('router', __name__)
+
+# Request headers passed through to shards
+FORWARDED_HEADERS = ('Content-Type', 'Accept')
+
+
+class ShardError(Exception):
+    """Raised when a shard cannot be reached"""
+
+
+class ShardRouter:
+    """Forward and fan out API calls across shard nodes"""
+
+    def __init__(self, shards, replicas=100, timeout=5.0, pool_size=20):
+        self.shards = [shard.rstrip('/') for shard in shards]
+        self.ring = HashRing(self.shards, replicas=replicas)
+        self.timeout = timeout
+        self.session = create_session(pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=max(4, 2 * len(self.shards)),
+                                            thread_name_prefix='weather-router')
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a router from Flask configuration values"""
+        shards = [shard.strip() for shard in config['WEATHER_SHARDS'].split(',') if shard.strip()]
+        return cls(
+            shards,
+            replicas=config.get('WEATHER_SHARD_REPLICAS', 100),
+            timeout=config.get('WEATHER_SHARD_TIMEOUT', 5.0)
+        )
+
+    def init_app(self, app):
+        """Register the router and its routes on a Flask application"""
+        app.extensions['weather_router'] = self
+        app.register_blueprint(router_bp, url_prefix='/api/v1')
+        return self
+
+    def forward(self, shard, method, path, **kwargs):
+        """Send a request to one shard"""
+        try:
+            return self.session.request(method, f'{shard}{path}', timeout=self.timeout, **kwargs)
+        except requests.RequestException as exc:
+            raise ShardError(f'Shard {shard} unavailable: {exc}') from exc
+
+    def submit(self, shard, method, path, **kwargs):
+        """Send a request to one shard in the background"""
+        return self._executor.submit(self.forward, shard, method, path, **kwargs)
+
+    def fan_out(self, method, path, shards=None, **kwargs):
+        """Send the same request to several shards in parallel"""
+        shards = self.shards if shards is None else shards
+        futures = [self.submit(shard, method, path, **kwargs) for shard in shards]
+        return [future.result() for future in futures]
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+def get_router():
+    return current_app.extensions['weather_router']
+
+
+def request_path():
+    """Path and query string of the current request"""
+    return request.full_path.rstrip('?')
+
+
+def forwarded_headers():
+    return {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+
+
+def proxy(upstream):
+    """Relay a shard response unchanged"""
+    return Response(upstream.content, status=upstream.status_code,
+                    content_type=upstream.headers.get('Content-Type'))
+
+
+def first_error(responses):
+    """Return the first non-200 shard response, if any"""
+    for upstream in responses:
+        if upstream.status_code != 200:
+            return upstream
+    return None
+
+
+def merge_summaries(summaries):
+    """Merge count/avg/min/max summaries from several shards"""
+    total = sum(summary['count'] for summary in summaries)
+    merged = {'count': total}
+    for key in summaries[0]:
+        if key == 'count':
+            continue
+        values = [(summary[key], summary['count']) for summary in summaries
+                  if summary.get(key) is not None]
+        if not values:
+            merged[key] = None
+        elif key.startswith('avg_'):
+            merged[key] = sum(value * count for value, count in values) / total
+        elif key.startswith('min_'):
+            merged[key] = min(value for value, _ in values)
+        else:
+            merged[key] = max(value for value, _ in values)
+    return merged
+
+
+def merge_histograms(histograms):
+    """Merge fixed-width histograms by summing counts per bucket"""
+    buckets = {}
+    for histogram in histograms:
+        for bucket in histogram:
+            key = (bucket['lower'], bucket['upper'])
+            buckets[key] = buckets.get(key, 0) + bucket['count']
+    return [{'lower': lower, 'upper': upper, 'count': count}
+            for (lower, upper), count in sorted(buckets.items())]
+
+
+@router_bp.errorhandler(ShardError)
+def handle_shard_error(error):
+    return jsonify({'error': str(error)}), 502
+
+
+router_bp.register_error_handler(APIError, handle_api_error)
+
+
+@router_bp.route('/weather/<location>', methods=['GET', 'PUT', 'DELETE'])
+def route_location(location):
+    """Forward single-location calls to the owning shard"""
+    router = get_router()
+    shard = router.ring.node_for(location)
+    return proxy(router.forward(shard, request.method, request_path(),
+                                data=request.get_data(), headers=forwarded_headers()))
+
+
+@router_bp.route('/weather/<location>/derived', methods=['GET'])
+def route_location_derived(location):
+    """Forward derived metrics for one location to the owning shard"""
+    router = get_router()
+    shard = router.ring.node_for(location)
+    return proxy(router.forward(shard, 'GET', request_path(), headers=forwarded_headers()))
+
+
+@router_bp.route('/weather', methods=['POST'])
+def route_create():
+    """Forward a new location to the shard that will own it"""
+    if not has_supported_body():
+        return jsonify({'error': 'Request must be JSON'}), 400
+
+    data = get_request_data()
+    if not isinstance(data.get('location'), str):
+        return jsonify({'error': 'Location is required'}), 400
+
+    router = get_router()
+    shard = router.ring.node_for(data['location'])
+    return proxy(router.forward(shard, 'POST', request.path, data=request.get_data(),
+                                headers=forwarded_headers()))
+
+
+def gather(path):
+    """Fan a read out to every shard and decode the JSON results
+
+    Returns (payloads, None) or (None, error_response).
+    """
+    responses = get_router().fan_out('GET', path, headers={'Accept': JSON})
+    error = first_error(responses)
+    if error is not None:
+        return None, proxy(error)
+    return [upstream.json() for upstream in responses], None
+
+
+@router_bp.route('/weather', methods=['GET'])
+def route_all_weather():
+    """Merge full listings from every shard"""
+    payloads, error = gather(request_path())
+    if error is not None:
+        return error
+
+    merged = {}
+    for payload in payloads:
+        merged.update(payload)
+    return respond(merged, arrow=True)
+
+
+@router_bp.route('/weather/search', methods=['GET'])
+def route_search():
+    """Run a search on every shard and merge the matches"""
+    payloads, error = gather(request_path())
+    if error is not None:
+        return error
+
+    merged = {}
+    for payload in payloads:
+        merged.update(payload)
+    return respond(merged)
+
+
+@router_bp.route('/weather/derived', methods=['GET'])
+def route_derived():
+    """Compute derived metrics on every shard and merge them"""
+    payloads, error = gather(request_path())
+    if error is not None:
+        return error
+
+    merged = {}
+    for payload in payloads:
+        merged.update(payload)
+    return respond(merged)
+
+
+@router_bp.route('/weather/expiry', methods=['GET'])
+def route_expiry():
+    """Sum expiry counters across shards"""
+    payloads, error = gather(request.path)
+    if error is not None:
+        return error
+
+    enabled = [payload for payload in payloads if payload.get('enabled')]
+    if not enabled:
+        return respond({'enabled': False})
+
+    result = {'enabled': True, 'default_ttl': enabled[0].get('default_ttl')}
+    for key in ('tracked', 'heap_size', 'expired_total'):
+        result[key] = sum(payload.get(key, 0) for payload in enabled)
+    return respond(result)
+
+
+@router_bp.route('/weather/stats', methods=['GET'])
+def route_stats():
+    """Combine per-shard statistics weighted by record count"""
+    payloads, error = gather(request.path)
+    if error is not None:
+        return error
+    return respond(merge_summaries(payloads))
+
+
+@router_bp.route('/weather/aggregate', methods=['GET'])
+def route_aggregate():
+    """Combine per-shard aggregations"""
+    if request.args.get('buckets') == 'quantile':
+        return jsonify({'error': 'Quantile buckets are not supported across shards'}), 400
+
+    payloads, error = gather(request_path())
+    if error is not None:
+        return error
+
+    result = merge_summaries([{key: value for key, value in payload.items()
+                               if key not in ('groups', 'histograms')} for payload in payloads])
+
+    if any('groups' in payload for payload in payloads):
+        names = {}
+        for payload in payloads:
+            for name, summary in payload['groups'].items():
+                names.setdefault(name, []).append(summary)
+        result['groups'] = {name: merge_summaries(summaries) for name, summaries in names.items()}
+
+    if any('histograms' in payload for payload in payloads):
+        fields = payloads[0]['histograms']
+        result['histograms'] = {field: merge_histograms([payload['histograms'][field] for payload in payloads])
+                                for field in fields}
+
+    return respond(result)
+
+
+@router_bp.route('/weather/extremes', methods=['GET'])
+def route_extremes():
+    """Merge each shard's top K into the overall top K"""
+    payloads, error = gather(request_path())
+    if error is not None:
+        return error
+
+    field = payloads[0]['field']
+    order = payloads[0]['order']
+    k = int(request.args.get('k', 10))
+    results = [result for payload in payloads for result in payload['results']]
+    results.sort(key=lambda result: (result[field], result['location']), reverse=order == 'highest')
+    return respond({'field': field, 'order': order, 'results': results[:k]})
+
+
+@router_bp.route('/weather/batch', methods=['GET', 'POST'])
+def route_batch():
+    """Split a batch read by owning shard and stitch the answers together"""
+    locations, message = parse_batch_locations()
+    if locations is None:
+        return jsonify({'error': message}), 400
+
+    names = list(dict.fromkeys(name.strip().lower() for name in locations))
+    router = get_router()
+    groups = router.ring.partition(names)
+
+    futures = [router.submit(shard, 'POST', request.path, json={'locations': group},
+                             headers={'Accept': JSON})
+               for shard, group in groups.items()]
+    found = {}
+    for future in futures:
+        upstream = future.result()
+        if upstream.status_code != 200:
+            return proxy(upstream)
+        found.update(upstream.json()['results'])
+
+    results = {name: found[name] for name in names if name in found}
+    missing = [name for name in names if name not in found]
+    return respond({'results': results, 'missing': missing})
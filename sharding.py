@@ -0,0 +1,55 @@
+"""Consistent hashing of locations onto shard nodes"""
+import hashlib
+from bisect import bisect
+
+
+def hash_key(key):
+    """Stable 64-bit hash (unlike hash(), identical across processes)"""
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Assign locations to nodes with a consistent hash ring
+
+    Each node is placed on the ring ``replicas`` times (virtual nodes) so
+    that keys spread evenly and adding or removing a node only moves about
+    1/N of the locations.
+    """
+
+    def __init__(self, nodes=(), replicas=100):
+        self.replicas = replicas
+        self.nodes = []
+        self._ring = []
+        self._owners = []
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        self._rebuild()
+
+    def remove_node(self, node):
+        self.nodes.remove(node)
+        self._rebuild()
+
+    def node_for(self, location):
+        """Return the node that owns a location"""
+        if not self._ring:
+            raise LookupError('Hash ring has no nodes')
+        index = bisect(self._ring, hash_key(location.lower())) % len(self._ring)
+        return self._owners[index]
+
+    def partition(self, locations):
+        """Group locations by owning node, keeping their order"""
+        groups = {}
+        for location in locations:
+            groups.setdefault(self.node_for(location), []).append(location)
+        return groups
+
+    def _rebuild(self):
+        points = sorted((hash_key(f'{node}#{replica}'), node)
+                        for node in self.nodes for replica in range(self.replicas))
+        self._ring = [point for point, _ in points]
+        self._owners = [node for _, node in points]
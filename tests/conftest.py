@@ -2,6 +2,7 @@
 import pytest
 import json
 from weather_api_next import create_app
+from weather_api_next.api.routes import weather_data
 
 @pytest.fixture
 def app():
@@ -15,6 +16,19 @@ def client(app):
     with app.test_client() as client:
         yield client
 
+@pytest.fixture
+def records():
+    """Locations for seeded_store; override in a module or parametrize"""
+    return {}
+
+@pytest.fixture
+def seeded_store(records):
+    """The shared store holding copies of ``records`` only, emptied afterwards"""
+    weather_data.clear()
+    weather_data.update({name: dict(data) for name, data in records.items()})
+    yield weather_data
+    weather_data.clear()
+
 @pytest.fixture
 def sample_weather_data():
     """Sample weather data for testing"""
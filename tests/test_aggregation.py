@@ -0,0 +1,110 @@
+"""Tests for the aggregation endpoint and helpers"""
+import json
+import pytest
+from weather_api_next.api.aggregation import (
+    MAX_BUCKETS, HistogramError, PartialAggregate, aggregate, quantile_buckets
+)
+
+RECORDS = {
+    'cairo': {'temperature': 33, 'conditions': 'Sunny', 'humidity': 20},
+    'miami': {'temperature': 29, 'conditions': 'Sunny', 'humidity': 80},
+    'london': {'temperature': 12, 'conditions': 'Rainy', 'humidity': 85},
+    'oslo': {'temperature': 0, 'conditions': 'Snow', 'humidity': 90}
+}
+
+
+@pytest.fixture
+def records():
+    return RECORDS
+
+
+@pytest.fixture
+def client(seeded_store, client):
+    """Test client over a store holding only RECORDS"""
+    return client
+
+
+class TestAggregationHelpers:
+    """Test the pure aggregation functions"""
+
+    def test_group_by_conditions(self):
+        result = aggregate(RECORDS.values(), group_by='conditions')
+        assert result['count'] == 4
+        assert result['groups']['Sunny']['count'] == 2
+        assert result['groups']['Sunny']['avg_temperature'] == 31
+        assert result['groups']['Snow']['max_humidity'] == 90
+
+    def test_fixed_width_histogram(self):
+        result = aggregate(RECORDS.values(), histograms=['temperature'], bucket_width=10)
+        assert result['histograms']['temperature'] == [
+            {'lower': 0, 'upper': 10, 'count': 1},
+            {'lower': 10, 'upper': 20, 'count': 1},
+            {'lower': 20, 'upper': 30, 'count': 1},
+            {'lower': 30, 'upper': 40, 'count': 1}
+        ]
+
+    def test_quantile_buckets_cover_all_values(self):
+        buckets = quantile_buckets(list(range(100)), 4)
+        assert len(buckets) == 4
+        assert sum(bucket['count'] for bucket in buckets) == 100
+        assert buckets[0]['lower'] == 0
+        assert buckets[-1]['upper'] == 99
+
+    def test_partials_merge_like_a_single_pass(self):
+        left, right = PartialAggregate(), PartialAggregate()
+        records = list(RECORDS.values())
+        for data in records[:2]:
+            left.add(data)
+        for data in records[2:]:
+            right.add(data)
+
+        assert left.merge(right).to_dict() == aggregate(records)
+
+
+class TestAggregationRoutes:
+    """Test the aggregation endpoint"""
+
+    def test_aggregate_with_filters(self, client):
+        response = client.get('/api/v1/weather/aggregate?group_by=conditions&min_temp=10')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['count'] == 3
+        assert set(data['groups']) == {'Sunny', 'Rainy'}
+
+    def test_aggregate_quantile_histogram(self, client):
+        response = client.get('/api/v1/weather/aggregate?histogram=humidity&buckets=quantile&quantiles=2')
+        assert response.status_code == 200
+        buckets = json.loads(response.data)['histograms']['humidity']
+        assert sum(bucket['count'] for bucket in buckets) == 4
+
+    @pytest.mark.parametrize('records', [{}, RECORDS], ids=['empty', 'seeded'])
+    def test_endpoint_matches_helper(self, client, records):
+        response = client.get('/api/v1/weather/aggregate?group_by=conditions&histogram=humidity')
+        expected = aggregate(records.values(), group_by='conditions', histograms=['humidity'])
+        assert json.loads(response.data) == expected
+
+    def test_aggregate_empty(self, client):
+        response = client.get('/api/v1/weather/aggregate?conditions=hail&histogram=temperature')
+        data = json.loads(response.data)
+        assert data['count'] == 0
+        assert data['avg_temperature'] is None
+        assert data['histograms']['temperature'] == []
+
+    def test_aggregate_invalid_parameters(self, client):
+        for query in ('group_by=location', 'histogram=wind', 'buckets=log',
+                      'bucket_width=0', 'bucket_width=nan', 'bucket_width=inf', 'bucket_width=-inf',
+                      'bucket_width=1e-320&histogram=temperature', 'quantiles=abc', 'min_temp=warm'):
+            response = client.get(f'/api/v1/weather/aggregate?{query}')
+            assert response.status_code == 400, query
+
+    def test_aggregate_caps_bucket_count(self, client):
+        response = client.get('/api/v1/weather/aggregate?histogram=humidity&bucket_width=0.01')
+        assert response.status_code == 200
+
+        with pytest.raises(HistogramError):
+            aggregate([{'temperature': index, 'humidity': 0} for index in range(MAX_BUCKETS + 1)],
+                      histograms=['temperature'], bucket_width=1)
+
+    def test_search_zero_min_temp(self, client):
+        response = client.get('/api/v1/weather/search?min_temp=0&max_temp=0')
+        assert list(json.loads(response.data)) == ['oslo']
@@ -0,0 +1,60 @@
+"""Tests for the multi-location batch endpoint"""
+import json
+import pytest
+
+RECORDS = {
+    'oslo': {'temperature': 2, 'conditions': 'Snow', 'humidity': 90},
+    'cairo': {'temperature': 33, 'conditions': 'Sunny', 'humidity': 20},
+    'lima': {'temperature': 19, 'conditions': 'Cloudy', 'humidity': 75}
+}
+
+
+@pytest.fixture
+def records():
+    return RECORDS
+
+
+@pytest.fixture
+def client(seeded_store, client):
+    """Test client over a store holding only RECORDS"""
+    return client
+
+
+class TestBatchRoutes:
+    """Test batch reads via query string and JSON body"""
+
+    def test_batch_query_string(self, client):
+        response = client.get('/api/v1/weather/batch?locations=Oslo,cairo,atlantis')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert set(data['results']) == {'oslo', 'cairo'}
+        assert data['results']['cairo']['temperature'] == 33
+        assert data['missing'] == ['atlantis']
+
+    def test_batch_json_body(self, client):
+        response = client.post(
+            '/api/v1/weather/batch',
+            data=json.dumps({'locations': ['lima', 'LIMA', 'nowhere', 'nowhere']}),
+            content_type='application/json'
+        )
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert list(data['results']) == ['lima']
+        assert data['missing'] == ['nowhere']
+
+    def test_batch_requires_locations(self, client):
+        response = client.get('/api/v1/weather/batch')
+        assert response.status_code == 400
+
+        response = client.post(
+            '/api/v1/weather/batch',
+            data=json.dumps({'locations': 'oslo'}),
+            content_type='application/json'
+        )
+        assert response.status_code == 400
+
+    def test_batch_limit(self, client):
+        names = ','.join(f'city{i}' for i in range(501))
+        response = client.get(f'/api/v1/weather/batch?locations={names}')
+        assert response.status_code == 400
+        assert '500' in json.loads(response.data)['error']
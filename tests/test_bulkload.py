@@ -0,0 +1,89 @@
+"""Tests for the offline bulk loader"""
+import json
+import pytest
+from weather_api_next import create_app
+from weather_api_next.api.routes import weather_data
+from weather_api_next.bulkload import bulk_load, parse_chunk, read_chunks
+
+CSV = (
+    'location,temperature,conditions,humidity\n'
+    'Oslo,2,Snow,90\n'
+    'Lima,19.5,Cloudy,75\n'
+    'bad!,1,Snow,50\n'
+    '\n'
+    'Cairo,warm,Sunny,10\n'
+)
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    weather_data.clear()
+    yield app
+    weather_data.clear()
+
+
+@pytest.fixture
+def files(tmp_path):
+    csv_path = tmp_path / 'stations.csv'
+    csv_path.write_text(CSV)
+    ndjson_path = tmp_path / 'stations.ndjson'
+    ndjson_path.write_text('\n'.join(json.dumps({
+        'location': f'station{index}', 'temperature': index % 40, 'conditions': 'Clear', 'humidity': 50
+    }) for index in range(250)) + '\n{"location": "oslo", "temperature": 3, "conditions": "Snow", "humidity": 91}\n')
+    return str(csv_path), str(ndjson_path)
+
+
+class TestBulkLoad:
+    """Test parsing, validation and loading"""
+
+    def test_parse_csv_chunk(self, files):
+        chunks = list(read_chunks(files[0], chunk_size=2))
+        assert [chunk[3] for chunk in chunks] == [2, 4, 6]
+
+        records, rows, errors = parse_chunk(next(read_chunks(files[0])))
+        assert records == {
+            'oslo': {'temperature': 2, 'conditions': 'Snow', 'humidity': 90},
+            'lima': {'temperature': 19.5, 'conditions': 'Cloudy', 'humidity': 75}
+        }
+        assert rows == 4
+        assert [(line, message) for _, line, message in errors] == [
+            (4, 'Location name contains invalid characters'),
+            (6, 'Temperature must be a number')
+        ]
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_bulk_load(self, app, files, workers):
+        report = bulk_load(files, workers=workers, chunk_size=40)
+        assert report['rows'] == 255
+        assert report['rejected'] == 2
+        assert report['loaded'] == len(weather_data) == 252
+        # Later files win for repeated locations
+        assert weather_data['oslo']['temperature'] == 3
+        assert weather_data['station0']['conditions'] is weather_data['station1']['conditions']
+
+    def test_replace_and_unsupported_files(self, app, files, tmp_path):
+        bulk_load(files[:1], workers=1, replace=True)
+        assert set(weather_data) == {'oslo', 'lima'}
+
+        other = tmp_path / 'stations.xml'
+        other.write_text('<stations/>')
+        with pytest.raises(ValueError):
+            bulk_load([str(other)], workers=1)
+
+    def test_startup_loads_csv_and_ndjson(self, files, monkeypatch, caplog):
+        import gc
+        from weather_api_next.config import TestingConfig
+
+        monkeypatch.setattr(TestingConfig, 'WEATHER_LOAD_WORKERS', 2)
+        for path, expected in zip(files, (2, 251)):
+            weather_data.clear()
+            monkeypatch.setattr(TestingConfig, 'WEATHER_DATA_FILE', path)
+            app = create_app('testing')
+            gc.unfreeze()
+            assert len(weather_data) == expected
+            assert any(record.levelname == 'WARNING' and 'rows/s' in record.getMessage()
+                       for record in caplog.records)
+            caplog.clear()
+            with app.test_client() as client:
+                assert client.get('/api/v1/weather/oslo').status_code == 200
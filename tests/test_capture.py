@@ -0,0 +1,116 @@
+"""Tests for traffic capture and replay"""
+import json
+import time
+from types import SimpleNamespace
+import pytest
+from weather_api_next import create_app
+from weather_api_next.api.routes import weather_data
+from weather_api_next.cluster import start_node
+from weather_api_next.config import TestingConfig
+from weather_api_next.replay import format_report, load_capture, percentile, replay
+
+
+@pytest.fixture
+def capture_path(tmp_path):
+    return tmp_path / 'capture.jsonl'
+
+
+@pytest.fixture
+def client(capture_path, monkeypatch):
+    monkeypatch.setattr(TestingConfig, 'WEATHER_CAPTURE_FILE', str(capture_path))
+    monkeypatch.setattr(TestingConfig, 'WEATHER_CAPTURE_SAMPLE', 1.0)
+    saved = dict(weather_data)
+    app = create_app('testing')
+    with app.test_client() as client:
+        yield client
+    app.extensions['weather_capture'].close()
+    weather_data.clear()
+    weather_data.update(saved)
+
+
+def read_entries(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class TestCapture:
+    """Test the capture middleware"""
+
+    def test_captures_requests(self, client, capture_path):
+        response = client.post('/api/v1/weather', content_type='application/json', data=json.dumps({
+            'location': 'Reykjavik', 'temperature': 4, 'conditions': 'Windy', 'humidity': 80
+        }))
+        # The application still sees the request body
+        assert response.status_code == 201
+        client.get('/api/v1/weather/search?conditions=windy', headers={'Accept': 'application/json'})
+        client.get('/api/v1/weather/nowhere')
+
+        post, search, missing = read_entries(capture_path)
+        assert post['method'] == 'POST'
+        assert post['rule'] == '/api/v1/weather'
+        assert json.loads(post['body'])['location'] == 'Reykjavik'
+        assert post['status'] == 201
+        assert post['duration_ms'] >= 0
+        assert search['query'] == 'conditions=windy'
+        assert search['accept'] == 'application/json'
+        assert search['body'] is None
+        assert missing['rule'] == '/api/v1/weather/<location>'
+        assert missing['status'] == 404
+
+    def test_sampling_and_exclusions(self, client, capture_path):
+        client.application.extensions['weather_capture'].sample = 0
+        client.get('/api/v1/weather')
+        client.application.extensions['weather_capture'].sample = 1.0
+        client.get('/api/v1/admin/memory')
+        assert capture_path.read_text() == ''
+
+    def test_disabled_by_default(self):
+        app = create_app('testing')
+        assert 'weather_capture' not in app.extensions
+
+
+class TestReplay:
+    """Test replaying a capture against a live node"""
+
+    def test_percentile(self):
+        assert percentile([1, 2, 3, 4], 0.5) == 2
+        assert percentile([1, 2, 3, 4], 0.99) == 4
+        assert percentile([], 0.5) is None
+
+    def test_latency_counts_from_scheduled_time(self):
+        class SlowSession:
+            def request(self, method, url, **kwargs):
+                time.sleep(0.05)
+                return SimpleNamespace(status_code=200)
+
+        # Five requests due at once on one worker: the last waits for the other four
+        entries = [{'ts': 100.0, 'method': 'GET', 'path': '/api/v1/weather', 'status': 200}
+                   for _ in range(5)]
+        report = replay(entries, 'http://replay.test', speed=1, concurrency=1, session=SlowSession())
+
+        assert report['overall']['max_ms'] >= 240
+        assert report['overall']['p50_ms'] >= 140
+
+    def test_replay_against_node(self, client, capture_path):
+        # The node starts with the default cities, so capture against the same data
+        weather_data['london'] = {'temperature': 15, 'conditions': 'Rainy', 'humidity': 80}
+        client.get('/api/v1/weather/stats')
+        client.put('/api/v1/weather/london', content_type='application/json',
+                   data=json.dumps({'temperature': 11, 'conditions': 'Fog', 'humidity': 90}))
+        client.get('/api/v1/weather/london')
+        client.get('/api/v1/weather/atlantis')
+
+        entries = load_capture(str(capture_path))
+        node = start_node(clear=False)
+        try:
+            report = replay(entries, node.url, speed=0, concurrency=2)
+            import requests
+            assert requests.get(f'{node.url}/api/v1/weather/london').json()['conditions'] == 'Fog'
+        finally:
+            node.stop()
+
+        assert report['requests'] == 4
+        assert report['errors'] == 0
+        assert report['status_mismatches'] == 0
+        assert report['by_rule']['GET /api/v1/weather/<location>']['count'] == 2
+        assert report['overall']['p99_ms'] >= report['overall']['p50_ms']
+        assert 'PUT /api/v1/weather/<location>' in format_report(report)
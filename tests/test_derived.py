@@ -0,0 +1,102 @@
+"""Tests for derived comfort metrics"""
+import json
+import random
+import pytest
+from weather_api_next.api.derived import derive, derive_batch, derive_loop, dew_point, heat_index
+
+RECORDS = {
+    'cairo': {'temperature': 38, 'conditions': 'Sunny', 'humidity': 10},
+    'miami': {'temperature': 30, 'conditions': 'Humid', 'humidity': 90},
+    'houston': {'temperature': 33, 'conditions': 'Humid', 'humidity': 60},
+    'london': {'temperature': 12, 'conditions': 'Rainy', 'humidity': 85},
+    'atacama': {'temperature': 20, 'conditions': 'Clear', 'humidity': 0},
+    'oslo': {'temperature': -5.5, 'conditions': 'Snow', 'humidity': 95}
+}
+
+
+@pytest.fixture
+def records():
+    return RECORDS
+
+
+@pytest.fixture
+def client(seeded_store, client):
+    """Test client over a store holding only RECORDS"""
+    return client
+
+
+class TestDerivedMath:
+    """Test the formulas against reference values"""
+
+    def test_dew_point(self):
+        assert dew_point(20, 100) == pytest.approx(20)
+        assert dew_point(30, 50) == pytest.approx(18.4, abs=0.1)
+        assert dew_point(20, 0) is None
+        # Outside the Magnus coefficients' range, including the pole at -243.12
+        for temperature in (-243.12, -250, -46, 61):
+            assert dew_point(temperature, 50) is None
+
+    def test_heat_index(self):
+        # NWS table: 90F at 60% humidity reads 100F
+        assert heat_index(32.22, 60) == pytest.approx(37.8, abs=0.5)
+        # Below 80F the index stays close to the air temperature
+        assert heat_index(15, 50) == pytest.approx(14, abs=1.5)
+
+    def test_batch_matches_loop(self):
+        pytest.importorskip('numpy')
+        assert derive_batch(RECORDS) == derive_loop(RECORDS)
+        assert derive_batch({}) == {}
+        extreme = {'pole': {'temperature': -243.12, 'conditions': 'Clear', 'humidity': 50}}
+        assert derive_batch(extreme) == derive_loop(extreme)
+        assert derive_batch(extreme)['pole']['dew_point'] is None
+
+    def test_batch_matches_loop_on_random_records(self):
+        pytest.importorskip('numpy')
+        rng = random.Random(2024)
+        records = {f'city{index}': {'temperature': round(rng.uniform(-300, 100), rng.randint(0, 3)),
+                                    'humidity': round(rng.uniform(0, 100), rng.randint(0, 3)),
+                                    'conditions': 'Clear'}
+                   for index in range(20000)}
+        assert derive_batch(records) == derive_loop(records)
+
+    def test_comfort_bands(self):
+        assert derive(RECORDS['miami'])['comfort'] == 'miserable'
+        assert derive(RECORDS['atacama'])['comfort'] == 'dry'
+        assert derive(RECORDS['atacama'])['dew_point'] is None
+
+
+class TestDerivedRoutes:
+    """Test the derived metrics endpoints"""
+
+    def test_single_location(self, client):
+        response = client.get('/api/v1/weather/Miami/derived')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['heat_index'] > 30
+        assert set(data) == {'temperature', 'humidity', 'dew_point', 'heat_index', 'comfort'}
+
+        assert client.get('/api/v1/weather/nowhere/derived').status_code == 404
+
+        client.post('/api/v1/weather', content_type='application/json', data=json.dumps(
+            {'location': 'pole', 'temperature': -243.12, 'conditions': 'Clear', 'humidity': 50}))
+        response = client.get('/api/v1/weather/pole/derived')
+        assert response.status_code == 200
+        assert json.loads(response.data)['dew_point'] is None
+
+    def test_filtered_set(self, client):
+        data = json.loads(client.get('/api/v1/weather/derived?conditions=humid').data)
+        assert sorted(data) == ['houston', 'miami']
+        assert len(json.loads(client.get('/api/v1/weather/derived').data)) == 6
+        assert client.get('/api/v1/weather/derived?min_temp=hot').status_code == 400
+
+    def test_results_cached_per_generation(self, client):
+        cache = client.application.extensions['weather_derived_cache']
+        client.get('/api/v1/weather/derived')
+        client.get('/api/v1/weather/derived')
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        client.put('/api/v1/weather/london', data=json.dumps({'temperature': 25, 'conditions': 'Rainy', 'humidity': 85}),
+                   content_type='application/json')
+        data = json.loads(client.get('/api/v1/weather/derived').data)
+        assert data['london']['temperature'] == 25
+        assert cache.misses == 2
@@ -0,0 +1,126 @@
+"""Tests for the change-tracking store and TTL expiry"""
+import json
+import pytest
+from weather_api_next import create_app
+from weather_api_next.api.routes import weather_data
+from weather_api_next.api.store import WeatherStore
+from weather_api_next.expiry import ExpiryScheduler
+
+READING = {'temperature': 10, 'conditions': 'Clear', 'humidity': 50}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestWeatherStore:
+    """Test mutation tracking on the store"""
+
+    def test_mutations_are_reported(self):
+        store = WeatherStore()
+        events = []
+        store.subscribe(lambda event, location, record: events.append((event, location)))
+
+        store['oslo'] = dict(READING)
+        store.merge('oslo', {'temperature': 3})
+        store.update({'lima': dict(READING)})
+        store.pop('lima')
+        store.pop('missing', None)
+        del store['oslo']
+        store.clear()
+
+        assert events == [('set', 'oslo'), ('set', 'oslo'), ('bulk', None),
+                          ('delete', 'lima'), ('delete', 'oslo'), ('clear', None)]
+        assert store.generation == 6
+
+    def test_bound_listeners_are_weak(self):
+        store = WeatherStore()
+        scheduler = ExpiryScheduler(store, default_ttl=5)
+        del scheduler
+
+        store['oslo'] = dict(READING)
+        assert store._listeners == []
+
+
+class TestExpiryScheduler:
+    """Test heap-driven expiry"""
+
+    def test_default_ttl_expires_records(self):
+        clock = FakeClock()
+        store = WeatherStore({'oslo': dict(READING)})
+        scheduler = ExpiryScheduler(store, default_ttl=10, clock=clock)
+        store['lima'] = dict(READING)
+
+        clock.now += 5
+        store['lima'] = dict(READING)  # a fresh reading resets the deadline
+
+        clock.now += 6
+        assert scheduler.sweep() == 1
+        assert list(store) == ['lima']
+
+        clock.now += 10
+        assert scheduler.sweep() == 1
+        assert scheduler.stats()['expired_total'] == 2
+        assert scheduler.stats()['tracked'] == 0
+
+    def test_per_record_ttl_and_cancellation(self):
+        clock = FakeClock()
+        store = WeatherStore()
+        scheduler = ExpiryScheduler(store, clock=clock)
+        store['oslo'] = dict(READING)
+        store['lima'] = dict(READING)
+        scheduler.schedule('oslo', 1)
+        scheduler.schedule('lima', 1)
+        del store['lima']
+
+        clock.now += 2
+        assert scheduler.sweep() == 1
+        assert store == {}
+
+    def test_sweep_skips_when_nothing_due(self):
+        clock = FakeClock()
+        store = WeatherStore()
+        scheduler = ExpiryScheduler(store, default_ttl=60, clock=clock)
+        for index in range(100):
+            store[f'city{index}'] = dict(READING)
+
+        assert scheduler.sweep() == 0
+        assert len(store) == 100
+
+
+class TestExpiryRoutes:
+    """Test per-record TTL through the API"""
+
+    @pytest.fixture
+    def client(self):
+        app = create_app('testing')
+        weather_data.clear()
+        self.clock = FakeClock()
+        app.extensions['weather_expiry'] = ExpiryScheduler(weather_data, clock=self.clock)
+        with app.test_client() as client:
+            yield client
+        weather_data.clear()
+
+    def test_ttl_in_request_body(self, client):
+        post_data = {'location': 'oslo', 'ttl': 30, **READING}
+        response = client.post('/api/v1/weather', data=json.dumps(post_data), content_type='application/json')
+        assert response.status_code == 201
+        assert 'ttl' not in json.loads(response.data)
+
+        self.clock.now += 31
+        assert client.get('/api/v1/weather/oslo').status_code == 404
+        assert json.loads(client.get('/api/v1/weather/stats').data)['count'] == 0
+
+        stats = json.loads(client.get('/api/v1/weather/expiry').data)
+        assert stats['enabled'] is True
+        assert stats['expired_total'] == 1
+
+    def test_invalid_ttl(self, client):
+        post_data = {'location': 'oslo', 'ttl': -1, **READING}
+        response = client.post('/api/v1/weather', data=json.dumps(post_data), content_type='application/json')
+        assert response.status_code == 400
+        assert 'ttl' in json.loads(response.data)['error']
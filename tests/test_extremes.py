@@ -0,0 +1,110 @@
+"""Tests for top-K extremes queries"""
+import json
+import random
+import pytest
+from weather_api_next.api.extremes import ExtremesIndex, top_k_scan
+from weather_api_next.api.store import WeatherStore
+
+RECORDS = {
+    'cairo': {'temperature': 38, 'conditions': 'Sunny', 'humidity': 10},
+    'miami': {'temperature': 30, 'conditions': 'Humid', 'humidity': 90},
+    'houston': {'temperature': 33, 'conditions': 'Partly Cloudy', 'humidity': 60},
+    'london': {'temperature': 12, 'conditions': 'Rainy', 'humidity': 85},
+    'seattle': {'temperature': 9.5, 'conditions': 'Cloudy', 'humidity': 80},
+    'oslo': {'temperature': -5.5, 'conditions': 'Snow', 'humidity': 95}
+}
+
+
+@pytest.fixture
+def records():
+    return RECORDS
+
+
+@pytest.fixture
+def client(seeded_store, client):
+    """Test client over a store holding only RECORDS"""
+    return client
+
+
+def locations(response):
+    return [result['location'] for result in json.loads(response.data)['results']]
+
+
+class TestExtremesIndex:
+    """Test that the maintained index agrees with a full sort"""
+
+    def test_matches_heap_scan_after_mutations(self):
+        store = WeatherStore()
+        index = ExtremesIndex(store)
+        rng = random.Random(7)
+        for step in range(2000):
+            name = f'station{rng.randrange(300)}'
+            action = rng.random()
+            if action < 0.6:
+                store[name] = {'temperature': rng.randint(-20, 40), 'humidity': rng.randint(0, 100),
+                               'conditions': rng.choice(['Sunny', 'Rainy', 'Snow'])}
+            elif action < 0.8 and name in store:
+                store.merge(name, {'temperature': rng.randint(-20, 40)})
+            elif action < 0.95:
+                store.pop(name, None)
+            else:
+                store.update({f'station{rng.randrange(300)}': {'temperature': 1, 'humidity': 2,
+                                                               'conditions': 'Fog'}})
+
+        for field in ('temperature', 'humidity'):
+            for order in ('highest', 'lowest'):
+                for conditions in (None, 'rain'):
+                    assert index.top_k(field, 15, order, conditions) == \
+                        top_k_scan(store, field, 15, order, conditions)
+
+    def test_clear_and_bulk_load(self):
+        store = WeatherStore()
+        index = ExtremesIndex(store)
+        store.update({name: dict(data) for name, data in RECORDS.items()})
+        assert index.top_k('temperature', 2) == ['cairo', 'houston']
+        store.clear()
+        assert index.top_k('temperature', 2) == []
+
+    def test_filtered_query_skips_records_deleted_meanwhile(self):
+        store = WeatherStore({name: dict(data) for name, data in RECORDS.items()})
+        index = ExtremesIndex(store)
+        # Gone from the dict, but the index has not heard of it yet
+        dict.pop(store, 'cairo')
+        assert index.top_k('temperature', 1, conditions='sunny') == []
+
+
+class TestExtremesRoute:
+    """Test the /weather/extremes endpoint"""
+
+    def test_hottest_and_coldest(self, client):
+        assert locations(client.get('/api/v1/weather/extremes?k=3')) == ['cairo', 'houston', 'miami']
+        assert locations(client.get('/api/v1/weather/extremes?k=2&order=lowest')) == ['oslo', 'seattle']
+
+    def test_most_humid_with_conditions(self, client):
+        response = client.get('/api/v1/weather/extremes?field=humidity&conditions=cloudy')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['field'] == 'humidity'
+        assert [result['location'] for result in data['results']] == ['seattle', 'houston']
+        assert data['results'][0]['humidity'] == 80
+
+    def test_reflects_writes(self, client):
+        client.put('/api/v1/weather/oslo', content_type='application/json',
+                   data=json.dumps({'temperature': 45, 'conditions': 'Heatwave', 'humidity': 20}))
+        assert locations(client.get('/api/v1/weather/extremes?k=1')) == ['oslo']
+        client.delete('/api/v1/weather/oslo')
+        assert locations(client.get('/api/v1/weather/extremes?k=1')) == ['cairo']
+
+    def test_non_finite_values_are_rejected(self, client):
+        body = '{"location": "nowhere", "temperature": NaN, "conditions": "Fog", "humidity": 50}'
+        response = client.post('/api/v1/weather', data=body, content_type='application/json')
+        assert response.status_code == 400
+        assert locations(client.get('/api/v1/weather/extremes?k=1')) == ['cairo']
+
+    def test_heap_fallback_without_index(self, client):
+        del client.application.extensions['weather_extremes']
+        assert locations(client.get('/api/v1/weather/extremes?k=3')) == ['cairo', 'houston', 'miami']
+
+    @pytest.mark.parametrize('query', ['field=pressure', 'order=up', 'k=0', 'k=ten', 'k=5000'])
+    def test_invalid_parameters(self, client, query):
+        assert client.get(f'/api/v1/weather/extremes?{query}').status_code == 400
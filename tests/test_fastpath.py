@@ -0,0 +1,84 @@
+"""Tests for the single-location read fast path"""
+import json
+import pytest
+from weather_api_next import create_app
+from weather_api_next.api.routes import weather_data
+from weather_api_next.config import TestingConfig
+
+RECORDS = {
+    'oslo': {'temperature': 2, 'conditions': 'Snow', 'humidity': 90},
+    'new york': {'temperature': 22.5, 'conditions': 'Partly Cloudy', 'humidity': 65, 'station': 'Café 1'}
+}
+
+PATHS = [
+    '/api/v1/weather/oslo',
+    '/api/v1/weather/OSLO',
+    '/api/v1/weather/New York',
+    '/api/v1/weather/atlantis',
+    '/api/v1/weather/stats',
+    '/api/v1/weather/oslo/derived',
+    '/api/v1/weather/',
+    '/api/v1/weather',
+]
+
+
+@pytest.fixture
+def records():
+    return RECORDS
+
+
+@pytest.fixture
+def apps(seeded_store, monkeypatch):
+    plain = create_app('testing')
+    monkeypatch.setattr(TestingConfig, 'WEATHER_FAST_PATH', True)
+    fast = create_app('testing')
+    return plain, fast
+
+
+def fetch(app, path, **kwargs):
+    with app.test_client() as client:
+        response = client.get(path, **kwargs)
+        return response.status, sorted(response.headers.items()), response.data
+
+
+class TestFastPath:
+    """The fast path must be indistinguishable from the Flask view"""
+
+    @pytest.mark.parametrize('path', PATHS)
+    def test_identical_responses(self, apps, path):
+        plain, fast = apps
+        assert fetch(fast, path) == fetch(plain, path)
+
+    @pytest.mark.parametrize('accept', ['*/*', 'application/json', 'application/msgpack', 'text/html'])
+    def test_accept_headers(self, apps, accept):
+        plain, fast = apps
+        path = '/api/v1/weather/oslo'
+        assert fetch(fast, path, headers={'Accept': accept}) == fetch(plain, path, headers={'Accept': accept})
+
+    def test_serves_only_hot_reads(self, apps):
+        _, fast = apps
+        fast_path = fast.extensions['weather_fast_path']
+        with fast.test_client() as client:
+            client.get('/api/v1/weather/oslo')
+            client.get('/api/v1/weather/missing')
+            client.get('/api/v1/weather/stats')
+            client.get('/api/v1/weather/oslo', headers={'Accept': 'application/cbor'})
+            response = client.put('/api/v1/weather/oslo', content_type='application/json',
+                                  data=json.dumps({'temperature': 5, 'conditions': 'Fog', 'humidity': 80}))
+            assert response.status_code == 200
+            assert json.loads(client.get('/api/v1/weather/Oslo').data)['conditions'] == 'Fog'
+        assert fast_path.served == 3
+
+    def test_expired_records_are_not_served(self, apps):
+        _, fast = apps
+        expiry = fast.extensions['weather_expiry']
+        expiry.clock = lambda: 0
+        expiry.schedule('oslo', 10)
+        expiry.clock = lambda: 11
+        with fast.test_client() as client:
+            assert client.get('/api/v1/weather/oslo').status_code == 404
+        assert 'oslo' not in weather_data
+
+    def test_off_by_default(self, apps):
+        plain, _ = apps
+        assert 'weather_fast_path' not in plain.extensions
@@ -0,0 +1,87 @@
+"""Tests for binary wire format negotiation"""
+import json
+import pytest
+from weather_api_next.api.routes import weather_data
+
+msgpack = pytest.importorskip('msgpack')
+
+
+@pytest.fixture
+def records():
+    return {'oslo': {'temperature': 2.5, 'conditions': 'Snow', 'humidity': 90}}
+
+
+@pytest.fixture
+def client(seeded_store, client):
+    """Test client over a store holding only oslo"""
+    return client
+
+
+class TestContentNegotiation:
+    """Test Accept and Content-Type handling"""
+
+    def test_json_is_default(self, client):
+        for accept in (None, '*/*', 'text/html'):
+            headers = {'Accept': accept} if accept else {}
+            response = client.get('/api/v1/weather/oslo', headers=headers)
+            assert response.mimetype == 'application/json'
+            assert response.headers['Vary'] == 'Accept'
+
+    def test_msgpack_response(self, client):
+        response = client.get('/api/v1/weather/oslo', headers={'Accept': 'application/msgpack'})
+        assert response.status_code == 200
+        assert response.mimetype == 'application/msgpack'
+        assert response.headers['Vary'] == 'Accept'
+        assert msgpack.unpackb(response.data) == weather_data['oslo']
+
+    def test_errors_stay_json(self, client):
+        response = client.get('/api/v1/weather/nowhere', headers={'Accept': 'application/msgpack'})
+        assert response.status_code == 404
+        assert json.loads(response.data)['error'] == 'Location not found'
+
+    def test_msgpack_request_body(self, client):
+        body = msgpack.packb({'location': 'bergen', 'temperature': 5, 'conditions': 'Rain', 'humidity': 95})
+        response = client.post('/api/v1/weather', data=body, content_type='application/x-msgpack',
+                               headers={'Accept': 'application/msgpack'})
+        assert response.status_code == 201
+        assert msgpack.unpackb(response.data)['humidity'] == 95
+
+        response = client.put('/api/v1/weather/bergen',
+                              data=msgpack.packb({'temperature': 6, 'conditions': 'Rain', 'humidity': 90}),
+                              content_type='application/msgpack')
+        assert response.status_code == 200
+        assert weather_data['bergen']['temperature'] == 6
+
+    def test_undecodable_body(self, client):
+        response = client.post('/api/v1/weather', data=b'\xc1', content_type='application/msgpack')
+        assert response.status_code == 400
+
+    def test_non_object_body(self, client):
+        for body in (msgpack.packb(5), msgpack.packb(['oslo'])):
+            for method, path in (('post', '/api/v1/weather'), ('put', '/api/v1/weather/oslo'),
+                                 ('post', '/api/v1/weather/batch'), ('post', '/api/v1/jobs')):
+                response = getattr(client, method)(path, data=body, content_type='application/msgpack')
+                assert response.status_code == 400, path
+                assert json.loads(response.data)['error'] == 'Request body must be an object'
+
+        response = client.post('/api/v1/weather', data='[1, 2]', content_type='application/json')
+        assert response.status_code == 400
+
+    def test_cbor_stats(self, client):
+        cbor2 = pytest.importorskip('cbor2')
+        response = client.get('/api/v1/weather/stats', headers={'Accept': 'application/cbor'})
+        assert response.mimetype == 'application/cbor'
+        assert cbor2.loads(response.data)['count'] == 1
+
+    def test_arrow_full_dataset(self, client):
+        pyarrow = pytest.importorskip('pyarrow')
+        import pyarrow.ipc
+        response = client.get('/api/v1/weather', headers={'Accept': 'application/vnd.apache.arrow.stream'})
+        assert response.mimetype == 'application/vnd.apache.arrow.stream'
+        table = pyarrow.ipc.open_stream(response.data).read_all()
+        assert table.column('location').to_pylist() == ['oslo']
+        assert table.column('temperature').to_pylist() == [2.5]
+
+        # Arrow is only offered for the full listing
+        response = client.get('/api/v1/weather/oslo', headers={'Accept': 'application/vnd.apache.arrow.stream'})
+        assert response.mimetype == 'application/json'
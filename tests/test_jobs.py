@@ -0,0 +1,144 @@
+"""Tests for background query jobs"""
+import json
+import threading
+import time
+import pytest
+from weather_api_next import create_app
+from weather_api_next.api.routes import weather_data
+
+RECORDS = {
+    'oslo': {'temperature': 2, 'conditions': 'Snow', 'humidity': 90},
+    'lima': {'temperature': 19, 'conditions': 'Cloudy', 'humidity': 75},
+    'cairo': {'temperature': 35, 'conditions': 'Sunny', 'humidity': 10},
+    'miami': {'temperature': 30, 'conditions': 'Partly Cloudy', 'humidity': 85}
+}
+
+
+def slow_count(records, seconds):
+    time.sleep(seconds)
+    return len(records)
+
+
+def temperatures(records):
+    return {location: data['temperature'] for location, data in records.items()}
+
+
+@pytest.fixture(scope='module')
+def app():
+    app = create_app('testing')
+    yield app
+    app.extensions['weather_jobs'].close()
+
+
+@pytest.fixture
+def records():
+    return RECORDS
+
+
+@pytest.fixture
+def client(seeded_store, client):
+    """Test client over a store holding only RECORDS"""
+    return client
+
+
+def submit(client, kind, **params):
+    return client.post('/api/v1/jobs', content_type='application/json',
+                       data=json.dumps({'type': kind, 'params': params}))
+
+
+def finished(client, job_id):
+    return json.loads(client.get(f'/api/v1/jobs/{job_id}?wait=30').data)
+
+
+class TestJobs:
+    """Test submitting, polling and cancelling jobs"""
+
+    def test_search_job_matches_endpoint(self, client):
+        response = submit(client, 'search', conditions='cloudy', min_temp=20)
+        assert response.status_code == 202
+        job = json.loads(response.data)
+        assert job['status'] in ('queued', 'running', 'done')
+        assert response.headers['Location'].endswith(f"/api/v1/jobs/{job['id']}")
+
+        job = finished(client, job['id'])
+        assert job['status'] == 'done'
+        assert job['result'] == json.loads(client.get('/api/v1/weather/search?conditions=cloudy&min_temp=20').data)
+        assert job['finished'] >= job['submitted']
+
+    def test_aggregate_job_matches_endpoint(self, client):
+        job = json.loads(submit(client, 'aggregate', group_by='conditions', histogram='temperature',
+                                bucket_width=10).data)
+        expected = json.loads(client.get('/api/v1/weather/aggregate?group_by=conditions'
+                                         '&histogram=temperature&bucket_width=10').data)
+        assert finished(client, job['id'])['result'] == expected
+
+    def test_results_use_snapshot_and_are_cached(self, client):
+        first = json.loads(submit(client, 'search', min_temp=25).data)
+        weather_data['dakar'] = {'temperature': 33, 'conditions': 'Sunny', 'humidity': 40}
+        assert sorted(finished(client, first['id'])['result']) == ['cairo', 'miami']
+
+        # Same query on the same data reuses the job, a write invalidates it
+        second = json.loads(submit(client, 'search', min_temp=25).data)
+        assert second['id'] != first['id']
+        third = json.loads(submit(client, 'search', min_temp=25).data)
+        assert third['id'] == second['id']
+        assert sorted(finished(client, third['id'])['result']) == ['cairo', 'dakar', 'miami']
+
+    def test_cancel_queued_job(self, client, app):
+        manager = app.extensions['weather_jobs']
+        busy = [manager.submit('slow', {'n': index}, slow_count, (1,)) for index in range(manager.workers)]
+        queued = manager.submit('slow', {'n': 'queued'}, slow_count, (0,))
+
+        response = client.delete(f'/api/v1/jobs/{queued.id}')
+        assert response.status_code == 200
+        assert json.loads(response.data)['status'] == 'cancelled'
+        assert finished(client, queued.id)['status'] == 'cancelled'
+        for job in busy:
+            assert finished(client, job.id)['result'] == len(RECORDS)
+
+    def test_pending_jobs_are_capped(self, client, app, monkeypatch):
+        manager = app.extensions['weather_jobs']
+        monkeypatch.setattr(manager, 'max_pending', manager.workers + 1)
+        busy = [manager.submit('slow', {'n': index}, slow_count, (0.5,))
+                for index in range(manager.max_pending)]
+
+        response = submit(client, 'search', min_temp=25)
+        assert response.status_code == 429
+        assert 'limit' in json.loads(response.data)['error']
+
+        for job in busy:
+            finished(client, job.id)
+        assert submit(client, 'search', min_temp=25).status_code == 202
+
+    def test_snapshot_is_taken_between_writes(self, client, app):
+        manager = app.extensions['weather_jobs']
+        stop = threading.Event()
+
+        def writer():
+            value = 0
+            while not stop.is_set():
+                value += 1
+                # One logical write touching two records, as a writer holding the lock
+                with weather_data.lock:
+                    weather_data.merge('oslo', {'temperature': value})
+                    weather_data.merge('lima', {'temperature': value})
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            jobs = [manager.submit('temperatures', {'n': index}, temperatures, ()) for index in range(5)]
+        finally:
+            stop.set()
+            thread.join()
+
+        for job in jobs:
+            result = finished(client, job.id)['result']
+            assert result['oslo'] == result['lima']
+
+    def test_errors(self, client):
+        assert submit(client, 'delete_everything').status_code == 400
+        assert submit(client, 'search', min_temp='warm').status_code == 400
+        assert submit(client, 'aggregate', buckets='weekly').status_code == 400
+        assert client.post('/api/v1/jobs', data='nope').status_code == 400
+        assert client.get('/api/v1/jobs/unknown').status_code == 404
+        assert client.delete('/api/v1/jobs/unknown').status_code == 404
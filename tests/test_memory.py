@@ -0,0 +1,102 @@
+"""Tests for the admin memory introspection endpoint"""
+import json
+import sys
+import threading
+import pytest
+from weather_api_next.api.memory import deep_sizeof, store_footprint, string_sharing
+from weather_api_next.api.routes import weather_data
+
+TOKEN = 'secret-admin-token'
+
+
+@pytest.fixture
+def records():
+    conditions = ['Sunny', 'Rainy']
+    # Build equal strings that are distinct objects
+    return {f'city{index}': {'temperature': index, 'humidity': 50,
+                             'conditions': ''.join(conditions[index % 2])}
+            for index in range(50)}
+
+
+@pytest.fixture
+def client(seeded_store, app, client):
+    """Admin-enabled test client over a store holding only the 50 cities"""
+    app.config['WEATHER_ADMIN_TOKEN'] = TOKEN
+    return client
+
+
+class TestMemoryHelpers:
+    """Test the size estimation helpers"""
+
+    def test_deep_sizeof_counts_shared_objects_once(self):
+        shared = 'x' * 1000
+        data = {'a': [shared], 'b': [shared]}
+        assert deep_sizeof(data) < 2 * sys.getsizeof(shared)
+        assert deep_sizeof(data) > sys.getsizeof(shared)
+
+    def test_sampled_estimate_is_close(self):
+        store = {f'city{index}': {'temperature': index * 1.5, 'conditions': f'c{index % 7}', 'humidity': 50}
+                 for index in range(5000)}
+        exact = store_footprint(store)
+        approximate = store_footprint(store, sample=200)
+        assert approximate['approximate'] is True
+        assert abs(approximate['total_bytes'] - exact['total_bytes']) / exact['total_bytes'] < 0.1
+
+    def test_string_sharing(self):
+        shared = 'Cloudy'
+        store = {'a': {'conditions': shared}, 'b': {'conditions': shared},
+                 'c': {'conditions': ''.join(['Cl', 'oudy'])}}
+        report = string_sharing(store)
+        assert report['references'] == 3
+        assert report['distinct_values'] == 1
+        assert report['shared_bytes'] > 0
+        assert report['internable_bytes'] > 0
+
+
+class TestMemoryRoute:
+    """Test access control and the report shape"""
+
+    def test_requires_token(self, client):
+        assert client.get('/api/v1/admin/memory').status_code == 401
+        assert client.get('/api/v1/admin/memory', headers={'X-Admin-Token': 'wrong'}).status_code == 401
+
+        client.application.config['WEATHER_ADMIN_TOKEN'] = None
+        assert client.get('/api/v1/admin/memory', headers={'X-Admin-Token': TOKEN}).status_code == 403
+
+    def test_report(self, client):
+        response = client.get('/api/v1/admin/memory?sample=10&tracemalloc=1',
+                              headers={'Authorization': f'Bearer {TOKEN}'})
+        assert response.status_code == 200
+        report = json.loads(response.data)
+        assert report['store']['locations'] == 50
+        assert report['store']['approximate'] is True
+        assert report['store']['per_record_bytes'] > 0
+        assert report['strings']['distinct_values'] == 2
+        assert 'weather_expiry' in report['components']
+        assert report['tracemalloc']['tracing'] in (True, False)
+
+    def test_report_during_writes(self, client):
+        stop = threading.Event()
+
+        def writer():
+            index = 0
+            while not stop.is_set():
+                weather_data[f'busy{index % 500}'] = {'temperature': 1, 'humidity': 2, 'conditions': 'Fog'}
+                if index % 3 == 0:
+                    weather_data.pop(f'busy{(index // 2) % 500}', None)
+                index += 1
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            for _ in range(20):
+                response = client.get('/api/v1/admin/memory?sample=100000', headers={'X-Admin-Token': TOKEN})
+                assert response.status_code == 200
+        finally:
+            stop.set()
+            thread.join()
+
+    @pytest.mark.parametrize('query', ['sample=0', 'sample=100001', 'top=0', 'top=-5', 'top=101', 'top=ten'])
+    def test_invalid_parameters(self, client, query):
+        response = client.get(f'/api/v1/admin/memory?{query}&tracemalloc=1', headers={'X-Admin-Token': TOKEN})
+        assert response.status_code == 400
@@ -0,0 +1,58 @@
+"""Tests for preloaded startup"""
+import gc
+import json
+import pytest
+from weather_api_next import create_app
+from weather_api_next.api.extremes import ExtremesIndex
+from weather_api_next.api.routes import weather_data
+from weather_api_next.preload import load_dataset, preload
+
+
+@pytest.fixture
+def app(seeded_store):
+    app = create_app('testing')
+    yield app
+    gc.unfreeze()
+
+
+class TestPreload:
+    """Test dataset loading, warmup and heap freezing"""
+
+    def test_load_json(self, tmp_path):
+        json_path = tmp_path / 'data.json'
+        json_path.write_text(json.dumps({'oslo': {'temperature': 2, 'conditions': 'Snow', 'humidity': 90}}))
+
+        assert load_dataset(str(json_path))['oslo']['temperature'] == 2
+
+    def test_preload_loads_valid_records_and_freezes(self, app, tmp_path):
+        path = tmp_path / 'data.json'
+        path.write_text(json.dumps({
+            'Oslo': {'temperature': 2, 'conditions': 'Snow', 'humidity': 90},
+            'Bergen': {'temperature': 5, 'conditions': 'Snow', 'humidity': 95},
+            'bad!': {'temperature': 1, 'conditions': 'Snow', 'humidity': 50},
+            'nowhere': {'temperature': 1, 'conditions': 'Snow', 'humidity': 500}
+        }))
+
+        assert preload(app, str(path)) == 2
+        assert set(weather_data) == {'oslo', 'bergen'}
+        # Repeated strings are shared between records
+        assert weather_data['oslo']['conditions'] is weather_data['bergen']['conditions']
+        assert gc.get_freeze_count() > 0
+
+        with app.test_client() as client:
+            assert client.get('/api/v1/weather/oslo').status_code == 200
+
+    def test_large_preload_rebuilds_index_once(self, app, tmp_path, monkeypatch):
+        path = tmp_path / 'data.json'
+        path.write_text(json.dumps({f'station{index}': {'temperature': index % 40, 'conditions': 'Clear',
+                                                        'humidity': index % 100}
+                                    for index in range(5000)}))
+
+        rebuilds = []
+        rebuild = ExtremesIndex._rebuild
+        monkeypatch.setattr(ExtremesIndex, '_rebuild', lambda self: rebuilds.append(1) or rebuild(self))
+        monkeypatch.setattr(ExtremesIndex, '_apply', lambda *args: pytest.fail('per-record index update'))
+
+        assert preload(app, str(path), warmup=False) == 5000
+        assert len(rebuilds) == 1
+        assert app.extensions['weather_extremes'].top_k('temperature', 1)[0].startswith('station')
@@ -0,0 +1,253 @@
+"""Tests for the upstream weather provider"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import responses
+
+from weather_api_next import create_app
+from weather_api_next.api.routes import weather_data
+from weather_api_next.provider import ProviderError, WeatherProvider
+
+UPSTREAM = 'http://upstream.test/weather'
+
+
+@pytest.fixture
+def store():
+    """A private store so provider tests do not touch shared state"""
+    return {}
+
+
+@pytest.fixture
+def provider(store):
+    provider = WeatherProvider(UPSTREAM, store=store, ttl=60, stale_ttl=600)
+    yield provider
+    provider.close()
+
+
+class TestWeatherProvider:
+    """Test fetching, coalescing and stale-while-revalidate"""
+
+    @responses.activate
+    def test_fetches_missing_location(self, provider, store):
+        responses.add(responses.GET, f'{UPSTREAM}/paris',
+                      json={'temperature': 18, 'conditions': 'Cloudy', 'humidity': 70, 'station': 'x'})
+
+        record = provider.get('Paris')
+
+        assert record == {'temperature': 18, 'conditions': 'Cloudy', 'humidity': 70}
+        assert store['paris'] == record
+        assert provider.is_upstream('paris')
+
+    @responses.activate
+    def test_unknown_location_returns_none(self, provider):
+        responses.add(responses.GET, f'{UPSTREAM}/atlantis', status=404)
+
+        assert provider.get('atlantis') is None
+
+    @responses.activate
+    def test_unknown_locations_are_remembered(self, provider):
+        responses.add(responses.GET, f'{UPSTREAM}/atlantis', status=404)
+
+        assert provider.get('atlantis') is None
+        assert provider.get('Atlantis') is None
+        assert len(responses.calls) == 1
+
+        # A local write clears the negative entry
+        provider.forget('atlantis')
+        assert provider.get('atlantis') is None
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_invalid_names_are_not_fetched(self, provider, store):
+        for name in ('a', 'a.b', 'x' * 51, 'stats'):
+            assert provider.get(name) is None
+        assert len(responses.calls) == 0
+        assert store == {}
+
+    def test_missing_entries_are_bounded(self, provider, monkeypatch):
+        monkeypatch.setattr(WeatherProvider, 'MAX_MISSING', 3)
+        for index in range(10):
+            provider._remember_missing(f'city{index}')
+        assert list(provider._missing) == ['city7', 'city8', 'city9']
+
+    @responses.activate
+    def test_upstream_failure_raises(self, provider):
+        responses.add(responses.GET, f'{UPSTREAM}/paris', status=503)
+
+        with pytest.raises(ProviderError):
+            provider.get('paris')
+
+    @responses.activate
+    def test_invalid_upstream_data_raises(self, provider):
+        responses.add(responses.GET, f'{UPSTREAM}/paris', json={'temperature': 'hot'})
+
+        with pytest.raises(ProviderError):
+            provider.get('paris')
+
+    def test_local_records_are_not_refreshed(self, provider, store):
+        store['oslo'] = {'temperature': 2, 'conditions': 'Snow', 'humidity': 90}
+
+        # No upstream mock is registered, so any fetch would fail
+        assert provider.get('oslo')['conditions'] == 'Snow'
+
+    @responses.activate
+    def test_concurrent_requests_share_one_fetch(self, provider):
+        calls = []
+
+        def slow_callback(request):
+            calls.append(request.url)
+            time.sleep(0.2)
+            return 200, {}, json.dumps({'temperature': 30, 'conditions': 'Sunny', 'humidity': 40})
+
+        responses.add_callback(responses.GET, f'{UPSTREAM}/cairo', callback=slow_callback)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(provider.get('cairo')))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert len(results) == 8
+        assert all(result['temperature'] == 30 for result in results)
+
+    @responses.activate
+    def test_stale_record_served_while_refreshing(self, store):
+        provider = WeatherProvider(UPSTREAM, store=store, ttl=0, stale_ttl=600)
+        responses.add(responses.GET, f'{UPSTREAM}/lima',
+                      json={'temperature': 20, 'conditions': 'Clear', 'humidity': 60})
+        provider.get('lima')
+
+        responses.replace(responses.GET, f'{UPSTREAM}/lima',
+                          json={'temperature': 24, 'conditions': 'Clear', 'humidity': 60})
+
+        # The stale copy is returned immediately and refreshed in the background
+        assert provider.get('lima')['temperature'] == 20
+        provider.refresh('lima').result(timeout=5)
+        assert store['lima']['temperature'] == 24
+        provider.close()
+
+    @responses.activate
+    def test_local_write_during_fetch_is_kept(self, provider, store):
+        fetching = threading.Event()
+        written = threading.Event()
+
+        def slow_callback(request):
+            fetching.set()
+            written.wait(5)
+            return 200, {}, json.dumps({'temperature': 30, 'conditions': 'Sunny', 'humidity': 40})
+
+        responses.add_callback(responses.GET, f'{UPSTREAM}/rome', callback=slow_callback)
+
+        results = []
+        thread = threading.Thread(target=lambda: results.append(provider.get('rome')))
+        thread.start()
+        assert fetching.wait(5)
+
+        # A POST lands while the fetch is still waiting on upstream
+        provider.forget('rome')
+        store['rome'] = {'temperature': 12, 'conditions': 'Rain', 'humidity': 85}
+        written.set()
+        thread.join()
+
+        assert results[0]['temperature'] == 12
+        assert store['rome']['temperature'] == 12
+        assert not provider.is_upstream('rome')
+
+    @responses.activate
+    def test_local_delete_during_fetch_is_kept(self, provider, store):
+        store['rome'] = {'temperature': 12, 'conditions': 'Rain', 'humidity': 85}
+        provider.forget('rome')
+        fetching = threading.Event()
+        deleted = threading.Event()
+
+        def slow_callback(request):
+            fetching.set()
+            deleted.wait(5)
+            return 200, {}, json.dumps({'temperature': 30, 'conditions': 'Sunny', 'humidity': 40})
+
+        responses.add_callback(responses.GET, f'{UPSTREAM}/rome', callback=slow_callback)
+        future = provider.refresh('rome')
+        assert fetching.wait(5)
+
+        provider.forget('rome')
+        store.pop('rome')
+        deleted.set()
+        future.result(timeout=5)
+
+        assert 'rome' not in store
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal keep-alive upstream that records client ports"""
+    protocol_version = 'HTTP/1.1'
+    ports = []
+
+    def do_GET(self):
+        self.ports.append(self.client_address[1])
+        body = json.dumps({'temperature': 11, 'conditions': 'Fog', 'humidity': 95}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubHandler.ports = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/weather'
+    server.shutdown()
+    server.server_close()
+
+
+class TestProviderIntegration:
+    """Test the provider against a local stub server and through the API"""
+
+    def test_connections_are_reused(self, stub_server, store):
+        provider = WeatherProvider(stub_server, store=store)
+
+        for name in ('dublin', 'berlin', 'madrid', 'rome'):
+            assert provider.get(name)['conditions'] == 'Fog'
+
+        assert len(StubHandler.ports) == 4
+        assert len(set(StubHandler.ports)) == 1
+        provider.close()
+
+    def test_api_fills_missing_location(self, stub_server):
+        app = create_app('testing')
+        provider = WeatherProvider(stub_server).init_app(app)
+        weather_data.pop('dublin', None)
+
+        with app.test_client() as client:
+            response = client.get('/api/v1/weather/Dublin')
+            assert response.status_code == 200
+            assert json.loads(response.data)['humidity'] == 95
+
+            client.delete('/api/v1/weather/dublin')
+            assert not provider.is_upstream('dublin')
+        provider.close()
+
+    @responses.activate
+    def test_api_reports_upstream_failure(self):
+        app = create_app('testing')
+        provider = WeatherProvider(UPSTREAM).init_app(app)
+        responses.add(responses.GET, f'{UPSTREAM}/nowhere', status=500)
+        weather_data.pop('nowhere', None)
+
+        with app.test_client() as client:
+            response = client.get('/api/v1/weather/nowhere')
+            assert response.status_code == 502
+            assert 'error' in json.loads(response.data)
+        provider.close()
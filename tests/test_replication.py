@@ -0,0 +1,269 @@
+"""Tests for leader-follower replication"""
+import gc
+import multiprocessing
+import os
+import threading
+import time
+import pytest
+import requests
+from weather_api_next.api.store import WeatherStore
+from weather_api_next import create_app
+from weather_api_next.cluster import start_node
+from weather_api_next.config import TestingConfig
+from weather_api_next.replication import Follower, LogTruncated, MutationLog, apply_entry
+
+READING = {'temperature': 10, 'conditions': 'Clear', 'humidity': 50}
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class TestMutationLog:
+    """Test the leader's log and replaying it"""
+
+    def test_replaying_the_log_reproduces_the_store(self):
+        leader = WeatherStore()
+        log = MutationLog(leader)
+        leader['oslo'] = dict(READING)
+        leader.update({'lima': dict(READING), 'cairo': dict(READING)})
+        leader.merge('oslo', {'temperature': 3})
+        del leader['lima']
+
+        position, entries = log.since(0)
+        assert position == 4
+        assert [entry['seq'] for entry in entries] == [1, 2, 3, 4]
+
+        follower = WeatherStore()
+        for entry in entries:
+            apply_entry(follower, entry)
+        assert follower == leader
+
+    def test_concurrent_writes_are_logged_in_store_order(self):
+        leader = WeatherStore()
+
+        def slow_listener(event, location, record):
+            # Delay the first write between changing the dict and logging it
+            if record and record['temperature'] == 1:
+                time.sleep(0.2)
+
+        leader.subscribe(slow_listener)
+        log = MutationLog(leader)
+        first = threading.Thread(target=leader.__setitem__, args=('oslo', {**READING, 'temperature': 1}))
+        first.start()
+        time.sleep(0.05)
+        leader['oslo'] = {**READING, 'temperature': 2}
+        first.join()
+
+        follower = WeatherStore()
+        for entry in log.since(0)[1]:
+            apply_entry(follower, entry)
+        assert follower == leader
+
+    def test_snapshot_and_partial_reads(self):
+        leader = WeatherStore()
+        log = MutationLog(leader)
+        for index in range(5):
+            leader[f'city{index}'] = dict(READING)
+
+        position, data = log.snapshot()
+        assert position == 5
+        assert set(data) == set(leader)
+
+        _, entries = log.since(3, limit=1)
+        assert [entry['seq'] for entry in entries] == [4]
+        assert log.since(5, wait=0.01) == (5, [])
+
+    def test_truncated_log(self):
+        leader = WeatherStore()
+        log = MutationLog(leader, max_entries=3)
+        for index in range(6):
+            leader[f'city{index}'] = dict(READING)
+
+        assert [entry['seq'] for entry in log.since(3)[1]] == [4, 5, 6]
+        with pytest.raises(LogTruncated):
+            log.since(2)
+
+    def test_positions_from_another_history_are_rejected(self):
+        leader = WeatherStore()
+        log = MutationLog(leader)
+        for index in range(3):
+            leader[f'city{index}'] = dict(READING)
+
+        # A follower ahead of the log, e.g. after the leader restarted
+        with pytest.raises(LogTruncated):
+            log.since(10)
+        with pytest.raises(LogTruncated):
+            log.since(1, epoch='previous-leader')
+        assert log.since(1, epoch=log.epoch)[0] == 3
+        assert MutationLog(WeatherStore()).epoch != log.epoch
+
+
+class TestFollowerAfterFork:
+    """The follower thread must run in every forked worker"""
+
+    def test_restarts_in_a_new_process(self):
+        follower = Follower('http://127.0.0.1:9', store=WeatherStore(), retry_delay=0.05).start()
+        try:
+            parent_thread = follower._thread
+            # What a forked worker sees: state copied from another pid, no thread
+            follower._pid = -1
+            follower.ensure_running()
+            assert follower._thread is not parent_thread
+            assert follower._thread.is_alive()
+            follower.ensure_running()
+        finally:
+            follower.stop()
+
+    def test_preloading_master_defers_to_workers(self, monkeypatch):
+        monkeypatch.setattr(TestingConfig, 'WEATHER_REPLICATION_ROLE', 'follower')
+        monkeypatch.setattr(TestingConfig, 'WEATHER_LEADER_URL', 'http://127.0.0.1:9', raising=False)
+        monkeypatch.setattr(TestingConfig, 'WEATHER_PRELOAD', True)
+        app = create_app('testing')
+        follower = app.extensions['weather_replication']
+        try:
+            # Warmup requests in the master did not start a thread
+            assert follower._thread is None
+
+            follower._pid = -1
+            with app.test_client() as client:
+                client.get('/health')
+                client.get('/api/v1/weather')
+            assert follower._thread is not None and follower._thread.is_alive()
+        finally:
+            follower.stop()
+            gc.unfreeze()
+
+    def test_fast_path_reads_start_the_follower(self, monkeypatch):
+        monkeypatch.setattr(TestingConfig, 'WEATHER_REPLICATION_ROLE', 'follower')
+        monkeypatch.setattr(TestingConfig, 'WEATHER_LEADER_URL', 'http://127.0.0.1:9', raising=False)
+        monkeypatch.setattr(TestingConfig, 'WEATHER_PRELOAD', True)
+        monkeypatch.setattr(TestingConfig, 'WEATHER_FAST_PATH', True)
+        app = create_app('testing')
+        follower = app.extensions['weather_replication']
+        try:
+            fast_path = app.extensions['weather_fast_path']
+            served = fast_path.served
+            follower._pid = -1
+            with app.test_client() as client:
+                client.get('/api/v1/weather/london')
+            assert fast_path.served == served + 1
+            assert follower._thread is not None and follower._thread.is_alive()
+        finally:
+            follower.stop()
+            gc.unfreeze()
+
+
+@pytest.fixture(scope='module')
+def cluster():
+    """A leader with a short log and two followers, each in its own process"""
+    leader = start_node({'WEATHER_REPLICATION_ROLE': 'leader', 'WEATHER_REPLICATION_LOG_SIZE': '5'})
+    followers = [start_node({'WEATHER_REPLICATION_ROLE': 'follower', 'WEATHER_LEADER_URL': leader.url,
+                             'WEATHER_REPLICATION_POLL_WAIT': '1'}, clear=False)
+                 for _ in range(2)]
+    yield leader, followers
+    for node in [*followers, leader]:
+        node.stop()
+
+
+class TestReplicationCluster:
+    """Test replication between local processes"""
+
+    def test_writes_reach_followers(self, cluster):
+        leader, followers = cluster
+        response = requests.post(f'{leader.url}/api/v1/weather', json={'location': 'oslo', **READING})
+        assert response.status_code == 201
+        requests.put(f'{leader.url}/api/v1/weather/oslo', json={**READING, 'temperature': 4})
+
+        for follower in followers:
+            assert wait_for(lambda: requests.get(f'{follower.url}/api/v1/weather/oslo').status_code == 200
+                            and requests.get(f'{follower.url}/api/v1/weather/oslo').json()['temperature'] == 4)
+
+        requests.delete(f'{leader.url}/api/v1/weather/oslo')
+        for follower in followers:
+            assert wait_for(lambda: requests.get(f'{follower.url}/api/v1/weather/oslo').status_code == 404)
+            status = requests.get(f'{follower.url}/api/v1/replication/status').json()
+            assert status['role'] == 'follower'
+            assert status['connected'] is True
+            assert status['lag_entries'] == 0
+
+    def test_followers_reject_writes(self, cluster):
+        _, followers = cluster
+        response = requests.post(f'{followers[0].url}/api/v1/weather', json={'location': 'lima', **READING})
+        assert response.status_code == 403
+        assert 'leader' in response.json()
+
+        # Batch reads use POST but are not writes
+        response = requests.post(f'{followers[0].url}/api/v1/weather/batch', json={'locations': ['lima']})
+        assert response.status_code == 200
+
+    def test_late_follower_catches_up_from_snapshot(self, cluster):
+        leader, _ = cluster
+        for index in range(12):
+            requests.post(f'{leader.url}/api/v1/weather', json={'location': f'late{index}', **READING})
+
+        follower = start_node({'WEATHER_REPLICATION_ROLE': 'follower', 'WEATHER_LEADER_URL': leader.url,
+                               'WEATHER_REPLICATION_POLL_WAIT': '1'}, clear=False)
+        try:
+            assert wait_for(lambda: len(requests.get(f'{follower.url}/api/v1/weather').json()) == 12)
+            status = requests.get(f'{follower.url}/api/v1/replication/status').json()
+            assert status['snapshots_loaded'] == 1
+            leader_status = requests.get(f'{leader.url}/api/v1/replication/status').json()
+            assert status['position'] == leader_status['position']
+            assert status['epoch'] == leader_status['epoch']
+        finally:
+            follower.stop()
+
+    def test_log_rejects_foreign_positions(self, cluster):
+        leader, _ = cluster
+        position = requests.get(f'{leader.url}/api/v1/replication/status').json()['position']
+        assert requests.get(f'{leader.url}/api/v1/replication/log',
+                            params={'since': position + 10}).status_code == 410
+        assert requests.get(f'{leader.url}/api/v1/replication/log',
+                            params={'since': position, 'epoch': 'previous-leader'}).status_code == 410
+
+    def test_follower_resnapshots_after_leader_restart(self):
+        leader = start_node({'WEATHER_REPLICATION_ROLE': 'leader'})
+        port = leader.port
+        follower = start_node({'WEATHER_REPLICATION_ROLE': 'follower', 'WEATHER_LEADER_URL': leader.url,
+                               'WEATHER_REPLICATION_POLL_WAIT': '1'}, clear=False)
+        try:
+            for index in range(5):
+                requests.post(f'{leader.url}/api/v1/weather', json={'location': f'old{index}', **READING})
+            assert wait_for(lambda: requests.get(f'{follower.url}/api/v1/replication/status').json()['position'] == 5)
+
+            # The new leader's history is shorter than the follower's position
+            leader.stop()
+            leader = start_node({'WEATHER_REPLICATION_ROLE': 'leader'}, port=port)
+            requests.post(f'{leader.url}/api/v1/weather', json={'location': 'fresh', **READING})
+
+            assert wait_for(lambda: set(requests.get(f'{follower.url}/api/v1/weather').json()) == {'fresh'})
+            status = requests.get(f'{follower.url}/api/v1/replication/status').json()
+            assert status['snapshots_loaded'] == 2
+            assert status['position'] == 1
+        finally:
+            follower.stop()
+            leader.stop()
+
+
+@pytest.mark.skipif((os.cpu_count() or 1) < 4, reason='read scaling needs idle cores for extra followers')
+def test_reads_scale_with_followers():
+    from weather_api_next.benchmarks.replication_reads import read_throughput, seed_leader
+
+    clients = os.cpu_count()
+    leader = start_node({'WEATHER_REPLICATION_ROLE': 'leader'})
+    try:
+        locations, position = seed_leader(leader, 200)
+        with multiprocessing.get_context('spawn').Pool(clients) as pool:
+            one = read_throughput(pool, leader, 1, locations, position, clients, 2.0)
+            two = read_throughput(pool, leader, 2, locations, position, clients, 2.0)
+    finally:
+        leader.stop()
+
+    # A second follower process must add real read capacity
+    assert two > 1.3 * one
@@ -0,0 +1,127 @@
+"""Tests for consistent hashing and the sharding router"""
+import json
+import pytest
+from weather_api_next import create_app
+from weather_api_next.cluster import start_node
+from weather_api_next.config import TestingConfig
+from weather_api_next.sharding import HashRing
+
+
+class TestHashRing:
+    """Test location placement on the ring"""
+
+    def test_placement_is_stable(self):
+        ring = HashRing(['a', 'b', 'c'])
+        again = HashRing(['c', 'b', 'a'])
+        names = [f'city{index}' for index in range(200)]
+        assert [ring.node_for(name) for name in names] == [again.node_for(name) for name in names]
+        assert ring.node_for('Oslo') == ring.node_for('oslo')
+
+    def test_keys_spread_across_nodes(self):
+        ring = HashRing(['a', 'b', 'c', 'd'])
+        groups = ring.partition([f'city{index}' for index in range(4000)])
+        assert set(groups) == {'a', 'b', 'c', 'd'}
+        assert all(600 < len(group) < 1400 for group in groups.values())
+
+    def test_adding_a_node_moves_few_keys(self):
+        names = [f'city{index}' for index in range(4000)]
+        ring = HashRing(['a', 'b', 'c'])
+        before = {name: ring.node_for(name) for name in names}
+        ring.add_node('d')
+        moved = [name for name in names if ring.node_for(name) != before[name]]
+        assert all(ring.node_for(name) == 'd' for name in moved)
+        assert len(moved) < 1600
+
+    def test_empty_ring(self):
+        with pytest.raises(LookupError):
+            HashRing().node_for('oslo')
+
+
+@pytest.fixture(scope='module')
+def shards():
+    """Three shard nodes in separate local processes"""
+    nodes = [start_node() for _ in range(3)]
+    yield nodes
+    for node in nodes:
+        node.stop()
+
+
+@pytest.fixture
+def client(shards, monkeypatch):
+    monkeypatch.setattr(TestingConfig, 'WEATHER_SHARDS', ','.join(node.url for node in shards))
+    app = create_app('testing')
+    with app.test_client() as client:
+        yield client
+    app.extensions['weather_router'].close()
+
+
+def post(client, location, temperature, conditions, humidity):
+    return client.post('/api/v1/weather', content_type='application/json', data=json.dumps({
+        'location': location, 'temperature': temperature, 'conditions': conditions, 'humidity': humidity
+    }))
+
+
+class TestShardRouter:
+    """Test routing and fan-out against real shard processes"""
+
+    def test_router_end_to_end(self, client, shards):
+        cities = [(f'city{index}', 10 + index, 'Sunny' if index % 2 else 'Rainy', 40 + index)
+                  for index in range(12)]
+        for city in cities:
+            assert post(client, *city).status_code == 201
+
+        # Writes are spread over the shards and each lives on exactly one
+        import requests
+        counts = [len(requests.get(f'{node.url}/api/v1/weather').json()) for node in shards]
+        assert sum(counts) == 12
+        assert sum(1 for count in counts if count) > 1
+
+        response = client.get('/api/v1/weather/CITY3')
+        assert response.status_code == 200
+        assert json.loads(response.data)['temperature'] == 13
+
+        assert len(json.loads(client.get('/api/v1/weather').data)) == 12
+
+        search = json.loads(client.get('/api/v1/weather/search?conditions=sunny&min_temp=15').data)
+        assert sorted(search) == ['city11', 'city5', 'city7', 'city9']
+
+        stats = json.loads(client.get('/api/v1/weather/stats').data)
+        assert stats['count'] == 12
+        assert stats['avg_temperature'] == pytest.approx(15.5)
+        assert stats['min_temperature'] == 10
+        assert stats['max_temperature'] == 21
+
+        aggregate = json.loads(client.get('/api/v1/weather/aggregate?group_by=conditions'
+                                          '&histogram=temperature&bucket_width=10').data)
+        assert aggregate['groups']['Sunny']['count'] == 6
+        assert sum(bucket['count'] for bucket in aggregate['histograms']['temperature']) == 12
+
+        extremes = json.loads(client.get('/api/v1/weather/extremes?k=3&conditions=rainy').data)
+        assert [result['location'] for result in extremes['results']] == ['city10', 'city8', 'city6']
+
+        batch = json.loads(client.get('/api/v1/weather/batch?locations=city1,nowhere,city11').data)
+        assert list(batch['results']) == ['city1', 'city11']
+        assert batch['missing'] == ['nowhere']
+
+        derived = json.loads(client.get('/api/v1/weather/derived?conditions=sunny').data)
+        assert sorted(derived) == sorted(city[0] for city in cities if city[2] == 'Sunny')
+        single = json.loads(client.get('/api/v1/weather/city3/derived').data)
+        assert single == derived['city3']
+        assert client.get('/api/v1/weather/nowhere/derived').status_code == 404
+
+        expiry = json.loads(client.get('/api/v1/weather/expiry').data)
+        assert expiry['enabled'] is True
+        assert expiry['tracked'] == 0
+
+        response = client.put('/api/v1/weather/city3', content_type='application/json',
+                              data=json.dumps({'temperature': 30, 'conditions': 'Hot', 'humidity': 10}))
+        assert json.loads(response.data)['temperature'] == 30
+
+        for city in cities:
+            assert client.delete(f'/api/v1/weather/{city[0]}').status_code == 204
+        assert client.get('/api/v1/weather/city3').status_code == 404
+
+    def test_shard_errors_are_relayed(self, client):
+        assert client.get('/api/v1/weather/search?min_temp=warm').status_code == 400
+        assert client.get('/api/v1/weather/aggregate?buckets=quantile').status_code == 400
+        assert post(client, 'bad!', 1, 'Clear', 1).status_code == 400
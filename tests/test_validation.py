@@ -47,6 +47,21 @@ class TestValidation:
         assert valid is False
         assert "between 2 and 50 characters" in message
 
+    def test_location_name_reserved(self):
+        """Test names of static /weather/* routes are rejected"""
+        from weather_api_next import create_app
+
+        app = create_app('testing')
+        prefix = '/api/v1/weather/'
+        static = {rule.rule[len(prefix):] for rule in app.url_map.iter_rules()
+                  if rule.rule.startswith(prefix) and '<' not in rule.rule}
+        assert static
+
+        for name in static | {'Stats', 'BATCH'}:
+            valid, message = validate_location_name(name)
+            assert valid is False, name
+            assert "reserved" in message
+
     def test_weather_data_valid(self):
         """Test valid weather data"""
         valid_data = {
@@ -112,6 +127,13 @@ class TestValidation:
         assert valid is False
         assert "between 0 and 100" in message
 
+        # NaN and infinities
+        for data in ({'temperature': float('nan'), 'conditions': 'Sunny', 'humidity': 50},
+                     {'temperature': float('-inf'), 'conditions': 'Sunny', 'humidity': 50},
+                     {'temperature': 25, 'conditions': 'Sunny', 'humidity': float('nan')}):
+            valid, message = validate_weather_data(data)
+            assert valid is False
+            assert "finite" in message
 
 
     @pytest.mark.parametrize('data,expected_valid,expected_message', [
@@ -0,0 +1,191 @@
+"""Tests for write-behind coalescing of updates"""
+import gc
+import json
+import os
+import time
+import weakref
+import pytest
+from weather_api_next import create_app
+from weather_api_next.api.store import WeatherStore
+from weather_api_next.config import TestingConfig
+from weather_api_next import writebehind
+from weather_api_next.writebehind import WriteBehindBuffer
+
+
+class Recorder:
+    def __init__(self, store):
+        self.events = []
+        store.subscribe(self.on_change)
+
+    def on_change(self, event, location, record):
+        self.events.append((event, location, dict(record) if record else record))
+
+
+@pytest.fixture
+def store():
+    return WeatherStore({'oslo': {'temperature': 2, 'conditions': 'Snow', 'humidity': 90},
+                         'lima': {'temperature': 19, 'conditions': 'Cloudy', 'humidity': 75}})
+
+
+@pytest.fixture
+def buffer(store):
+    buffer = WriteBehindBuffer(store, window=60)
+    yield buffer
+    buffer.close()
+
+
+class TestWriteBehindBuffer:
+    """Test coalescing and flushing"""
+
+    def test_coalesces_updates_per_location(self, store, buffer):
+        recorder = Recorder(store)
+        generation = store.generation
+        buffer.merge('oslo', {'temperature': 3})
+        buffer.merge('oslo', {'humidity': 80})
+        buffer.merge('oslo', {'temperature': 4})
+        buffer.merge('lima', {'conditions': 'Sunny'})
+
+        # Readers see the writes, listeners do not yet
+        assert store['oslo'] == {'temperature': 4, 'conditions': 'Snow', 'humidity': 80}
+        assert store.generation == generation + 4
+        assert recorder.events == []
+
+        assert buffer.flush() == 2
+        assert [event for event, _, _ in recorder.events] == ['bulk']
+        stats = buffer.stats()
+        assert stats['writes'] == 4
+        assert stats['coalesced'] == 2
+        assert stats['flushed'] == 2
+        assert buffer.flush() == 0
+
+    def test_flush_payload(self, store, buffer):
+        events = []
+        store.subscribe(lambda event, location, record: events.append((event, dict(record))))
+        buffer.merge('oslo', {'temperature': 3})
+        buffer.flush()
+        assert events == [('bulk', {'oslo': {'temperature': 3, 'conditions': 'Snow', 'humidity': 90}})]
+
+    def test_deleted_and_replaced_records_are_skipped(self, store, buffer):
+        buffer.merge('oslo', {'temperature': 3})
+        buffer.merge('lima', {'temperature': 20})
+        del store['oslo']
+        store['lima'] = {'temperature': 25, 'conditions': 'Sunny', 'humidity': 40}
+        assert buffer.flush() == 0
+
+    def test_immediate_write_drops_pending(self, store, buffer):
+        recorder = Recorder(store)
+        buffer.merge('oslo', {'temperature': 3})
+        buffer.merge('oslo', {'temperature': 5}, defer=False)
+        assert [event for event, _, _ in recorder.events] == ['set']
+        assert buffer.flush() == 0
+
+    def test_max_batch_and_window_flush(self, store):
+        buffer = WriteBehindBuffer(store, window=0.05, max_batch=2)
+        recorder = Recorder(store)
+        try:
+            buffer.merge('oslo', {'temperature': 3})
+            buffer.merge('lima', {'temperature': 20})
+            assert len(recorder.events) == 1
+
+            buffer.merge('oslo', {'temperature': 4})
+            deadline = time.monotonic() + 2
+            while len(recorder.events) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert len(recorder.events) == 2
+        finally:
+            buffer.close()
+
+
+    def test_thread_starts_on_first_write(self, store):
+        buffer = WriteBehindBuffer(store, window=0.01)
+        try:
+            assert buffer._thread is None
+            buffer.merge('oslo', {'temperature': 3})
+            assert buffer._thread.is_alive()
+        finally:
+            buffer.close()
+
+    def test_dropped_buffers_are_released(self, store, monkeypatch):
+        monkeypatch.setattr(writebehind, 'IDLE_WAIT', 0.01)
+        buffer = WriteBehindBuffer(store, window=0.01)
+        buffer.merge('oslo', {'temperature': 3})
+        thread = buffer._thread
+        ref = weakref.ref(buffer)
+        assert buffer in writebehind._buffers
+
+        del buffer
+        thread.join(5)
+        gc.collect()
+        assert not thread.is_alive()
+        assert ref() is None
+        assert store['oslo']['temperature'] == 3
+
+    @pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+    def test_flushes_in_forked_child(self, store):
+        buffer = WriteBehindBuffer(store, window=0.01)
+        buffer.merge('lima', {'temperature': 20})
+        recorder = Recorder(store)
+
+        # Fork while the parent holds the lock, as a preloading master might
+        with buffer._lock:
+            pid = os.fork()
+        if pid == 0:
+            ok = False
+            try:
+                buffer.merge('oslo', {'temperature': 3})
+                deadline = time.monotonic() + 5
+                while not recorder.events and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                ok = buffer._thread.is_alive() and len(recorder.events) == 1
+            finally:
+                os._exit(0 if ok else 1)
+
+        _, status = os.waitpid(pid, 0)
+        buffer.close()
+        assert os.WEXITSTATUS(status) == 0
+
+
+@pytest.fixture
+def records():
+    return {'oslo': {'temperature': 2, 'conditions': 'Snow', 'humidity': 90},
+            'lima': {'temperature': 19, 'conditions': 'Cloudy', 'humidity': 75}}
+
+
+@pytest.fixture
+def app(seeded_store, monkeypatch):
+    """An app with a long write-behind window, created over the seeded store"""
+    monkeypatch.setattr(TestingConfig, 'WEATHER_WRITE_BEHIND_WINDOW', 60)
+    monkeypatch.setattr(TestingConfig, 'WEATHER_RECORD_TTL', 3600)
+    app = create_app('testing')
+    yield app
+    app.extensions['weather_write_behind'].close()
+
+
+def put(client, location, **data):
+    return client.put(f'/api/v1/weather/{location}', content_type='application/json',
+                      data=json.dumps({'temperature': 2, 'conditions': 'Snow', 'humidity': 90, **data}))
+
+
+class TestWriteBehindRoutes:
+    """Test PUT behaviour with write-behind enabled"""
+
+    def test_reads_see_writes_before_flush(self, client):
+        assert put(client, 'Oslo', temperature=30).status_code == 200
+        assert json.loads(client.get('/api/v1/weather/oslo').data)['temperature'] == 30
+        assert client.application.extensions['weather_write_behind'].stats()['pending'] == 1
+
+        extremes = client.application.extensions['weather_extremes']
+        assert extremes.top_k('temperature', 1) == ['lima']
+        client.application.extensions['weather_write_behind'].flush()
+        assert extremes.top_k('temperature', 1) == ['oslo']
+
+    def test_ttl_writes_are_not_deferred(self, client):
+        expiry = client.application.extensions['weather_expiry']
+        put(client, 'oslo', temperature=5)
+        assert put(client, 'oslo', temperature=6, ttl=5).status_code == 200
+        deadline = expiry.deadline('oslo')
+        assert deadline - time.monotonic() < 10
+
+        # Nothing left to flush that would reset the TTL to the default
+        client.application.extensions['weather_write_behind'].flush()
+        assert expiry.deadline('oslo') == deadline
@@ -0,0 +1,175 @@
+"""Write-behind coalescing of frequent record updates
+
+Updates are applied to the record in the store straight away, so every
+reader sees them, but telling the store's listeners (extremes index,
+expiry, replication log) is deferred. Repeated updates to a location
+within the window merge field by field, last write wins, and go out as
+one 'bulk' change per flush.
+"""
+import atexit
+import os
+import threading
+import time
+import weakref
+
+# Seconds an idle flush thread waits before checking whether its buffer is gone
+IDLE_WAIT = 1.0
+
+# Live buffers, flushed at exit and reset in forked children by one hook each
+_buffers = weakref.WeakSet()
+
+
+class WriteBehindBuffer:
+    """Coalesce store change notifications for in-place updates"""
+
+    def __init__(self, store=None, window=0.05, max_batch=1000, clock=time.monotonic):
+        if store is None:
+            from weather_api_next.api.routes import weather_data as store
+        self.store = store
+        self.window = window
+        self.max_batch = max_batch
+        self.clock = clock
+        self.writes = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.flushed = 0
+        self._pending = {}
+        self._first_write = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopped = threading.Event()
+        self._thread = None
+        _buffers.add(self)
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a buffer from Flask configuration values"""
+        return cls(window=config['WEATHER_WRITE_BEHIND_WINDOW'],
+                   max_batch=config.get('WEATHER_WRITE_BEHIND_MAX_BATCH', 1000))
+
+    def init_app(self, app):
+        """Register the buffer on a Flask application"""
+        app.extensions['weather_write_behind'] = self
+        return self
+
+    def merge(self, location, data, defer=True):
+        """Update a record now and report the change within the window
+
+        ``defer=False`` reports this and any pending update immediately,
+        for writes whose follow-up (such as a per-record TTL) must come
+        after listeners have seen them.
+        """
+        if not defer:
+            with self._lock:
+                self._pending.pop(location, None)
+            return self.store.merge(location, data)
+
+        with self._lock:
+            if self._thread is None:
+                self._start()
+            record = self.store.merge(location, data, notify=False)
+            self.writes += 1
+            if location in self._pending:
+                self.coalesced += 1
+            else:
+                if not self._pending:
+                    self._first_write = self.clock()
+                    self._wakeup.notify()
+                self._pending[location] = record
+            full = len(self._pending) >= self.max_batch
+
+        if full:
+            self.flush()
+        return record
+
+    def flush(self):
+        """Report every pending update to the store's listeners"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._first_write = None
+        if not pending:
+            return 0
+
+        # Records deleted or replaced since were already reported by the store
+        with self.store.lock:
+            batch = {location: record for location, record in pending.items()
+                     if self.store.get(location) is record}
+            if batch:
+                self.store.notify('bulk', None, batch)
+        with self._lock:
+            self.flushes += 1
+            self.flushed += len(batch)
+        return len(batch)
+
+    def stats(self):
+        """Counters describing the buffer"""
+        return {
+            'window': self.window,
+            'pending': len(self._pending),
+            'writes': self.writes,
+            'coalesced': self.coalesced,
+            'flushes': self.flushes,
+            'flushed': self.flushed
+        }
+
+    def close(self):
+        """Stop the flush thread after reporting what is still pending"""
+        self._stopped.set()
+        with self._lock:
+            self._wakeup.notify()
+        self.flush()
+
+    def _start(self):
+        # Started on first use so it runs in the process taking the writes,
+        # not in a preloading gunicorn master whose threads die at fork
+        self._thread = threading.Thread(target=_run, args=(weakref.ref(self),),
+                                        name='weather-write-behind', daemon=True)
+        self._thread.start()
+
+    def _after_fork(self):
+        """Give a forked child its own unlocked state; its thread starts on first write"""
+        stopped = self._stopped.is_set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopped = threading.Event()
+        if stopped:
+            self._stopped.set()
+        self._thread = None
+
+    def _step(self):
+        """Wait briefly for pending updates and flush them once their window passes"""
+        with self._lock:
+            if not self._pending and not self._stopped.is_set():
+                self._wakeup.wait(IDLE_WAIT)
+            first = self._first_write
+        if first is not None:
+            delay = first + self.window - self.clock()
+            if delay > 0:
+                self._stopped.wait(delay)
+            self.flush()
+
+
+def _run(ref):
+    # Holds the buffer only weakly between steps, so a buffer whose app is
+    # gone is collected and its thread ends instead of living on
+    while True:
+        buffer = ref()
+        if buffer is None or buffer._stopped.is_set():
+            return
+        buffer._step()
+        del buffer
+
+
+def _close_all():
+    for buffer in list(_buffers):
+        buffer.close()
+
+
+def _after_fork_all():
+    for buffer in list(_buffers):
+        buffer._after_fork()
+
+
+atexit.register(_close_all)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_all)